@@ -3,7 +3,7 @@ from agents.context_expansion_agent import context_expansion_agent
 from agents.product_filter_agent import product_filter_agent
 from agents.common_models import (
     GroceryItem, GroceryList, ProductMatch, ProductMatches, 
-    RetrievalResults, FilterData
+    RetrievalResults, FilterData, RankingSignals
 )
 
 __all__ = [
@@ -15,5 +15,6 @@ __all__ = [
     'ProductMatch',
     'ProductMatches',
     'RetrievalResults',
-    'FilterData'
+    'FilterData',
+    'RankingSignals'
 ] 
\ No newline at end of file
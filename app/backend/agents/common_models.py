@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import List, Dict, Optional, Set
 
 class GroceryItem(BaseModel):
@@ -18,11 +18,32 @@ class ProductMatch(BaseModel):
     category: str = Field(..., description="The supermarket category where this product is located")
     similarity: float = Field(..., description="Similarity score between the product and the searched item (0.0 to 1.0)")
     nome_mercado: str = Field(..., description="Name of the supermarket where this product is available")
+    
+    # Market names resolved from the catalog's market index (kept out of the schema)
+    _markets: Optional[List[str]] = PrivateAttr(default=None)
+    
+    @property
+    def markets(self) -> List[str]:
+        """Markets selling the product, split from nome_mercado only if the retrieval did not set them."""
+        if self._markets is None:
+            self._markets = self.nome_mercado.split('|') if self.nome_mercado else []
+        return self._markets
+
+class RankingSignals(BaseModel):
+    candidate_count: int = Field(..., description="Number of candidate products that were ranked")
+    top_similarity: float = Field(..., description="Highest similarity among the candidates")
+    cutoff_similarity: float = Field(..., description="Lowest similarity among the returned matches")
+    tail_similarity: Optional[float] = Field(None, description="Mean similarity of the candidates that were not returned")
+    mean_similarity: float = Field(..., description="Mean similarity of all candidates")
+    std_similarity: float = Field(..., description="Standard deviation of the candidate similarities")
+    threshold: float = Field(..., description="Adaptive threshold applied to the candidates")
+    keyword_hits: int = Field(..., description="Number of candidates whose name contains the item or a synonym")
 
 class ProductMatches(BaseModel):
     query_item: str = Field(..., description="The original grocery item that was searched for")
     matches: List[ProductMatch] = Field(..., description="List of products found that match the search criteria")
     matched_categories: List[str] = Field(..., description="List of categories where matching products were found")
+    signals: Optional[RankingSignals] = Field(None, exclude=True, description="Ranking statistics used to decide whether the LLM filter is needed")
 
 class RetrievalResults(BaseModel):
     corrected_list: GroceryList = Field(..., description="The original grocery list with corrected item names")
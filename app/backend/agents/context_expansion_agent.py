@@ -1,18 +1,24 @@
+import hashlib
 from pydantic_ai import Agent, RunContext
 from agents.common_models import GroceryItem
 
+SYSTEM_PROMPT = (
+    'Você é um assistente especializado em produtos de supermercado. '
+    'Para um item de compra, retorne informações expandidas incluindo possíveis sinônimos, '
+    'possíveis categorias onde o produto pode ser encontrado, e uma breve descrição do produto. '
+    'Exemplo para "leite": {"name": "leite", "possible_synonyms": ["leite integral", "leite desnatado"], '
+    '"possible_categories": ["laticínios", "bebidas", "refrigerados"], '
+    '"description": "leite é uma bebida láctea nutritiva usada para consumo direto e preparo de alimentos"}'
+)
+
+# Changes whenever the prompt changes, so results cached under an older prompt are not reused
+PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:12]
+
 context_expansion_agent = Agent(
     'openai:gpt-4o-mini',
     deps_type=None,
     result_type=GroceryItem,
-    system_prompt=(
-        'Você é um assistente especializado em produtos de supermercado. '
-        'Para um item de compra, retorne informações expandidas incluindo possíveis sinônimos, '
-        'possíveis categorias onde o produto pode ser encontrado, e uma breve descrição do produto. '
-        'Exemplo para "leite": {"name": "leite", "possible_synonyms": ["leite integral", "leite desnatado"], '
-        '"possible_categories": ["laticínios", "bebidas", "refrigerados"], '
-        '"description": "leite é uma bebida láctea nutritiva usada para consumo direto e preparo de alimentos"}'
-    )
+    system_prompt=SYSTEM_PROMPT
 )
 
 @context_expansion_agent.tool
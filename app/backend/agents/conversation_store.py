@@ -0,0 +1,156 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import replace
+
+from pydantic_ai.messages import ModelRequest, SystemPromptPart, ToolReturnPart, UserPromptPart
+
+
+def summarize_search(content):
+    """Short stand-in for a search_products tool result: per item, how many products and the cheapest."""
+    results = content.get("results") if isinstance(content, dict) else None
+    if results is None or not hasattr(results, "product_matches"):
+        return content
+
+    items = {}
+    for item_name, item_results in results.product_matches.items():
+        matches = item_results.matches if item_results else []
+        if matches:
+            cheapest = min(matches, key=lambda match: match.price)
+            items[item_name] = f"{len(matches)} produtos, mais barato: {cheapest.name} (R$ {cheapest.price:.2f})"
+    return {
+        "resumo": "Resultados completos já enviados ao usuário",
+        "itens": items,
+        "not_found": content.get("not_found", []),
+    }
+
+# Tool results replaced by a summary once their turn is over
+COMPACTED_TOOLS = {
+    "search_products": summarize_search,
+}
+
+def _starts_turn(message):
+    return isinstance(message, ModelRequest) and any(isinstance(part, UserPromptPart) for part in message.parts)
+
+def compact_history(messages, max_turns=10):
+    """
+    Bound a conversation's message history for the next run.
+
+    Only the last `max_turns` user turns are kept (the system prompt is carried over
+    to the first one kept), and the large tool results of every turn but the last are
+    replaced by their summaries (COMPACTED_TOOLS), so each request sends about the
+    same number of tokens however long the conversation gets.
+    """
+    starts = [i for i, message in enumerate(messages) if _starts_turn(message)]
+    if not starts:
+        return list(messages)
+
+    system_parts = [part for part in messages[0].parts if isinstance(part, SystemPromptPart)] \
+        if isinstance(messages[0], ModelRequest) else []
+    first = starts[-max_turns] if max_turns and len(starts) > max_turns else 0
+    last_turn = starts[-1]
+
+    compacted = []
+    for i in range(first, len(messages)):
+        message = messages[i]
+        if i < last_turn and isinstance(message, ModelRequest):
+            parts = [
+                replace(part, content=COMPACTED_TOOLS[part.tool_name](part.content))
+                if isinstance(part, ToolReturnPart) and part.tool_name in COMPACTED_TOOLS else part
+                for part in message.parts
+            ]
+            message = replace(message, parts=parts)
+        compacted.append(message)
+
+    if first > 0 and system_parts:
+        # The agent only adds its system prompt to a conversation without history
+        head = compacted[0]
+        compacted[0] = replace(head, parts=system_parts + [part for part in head.parts if not isinstance(part, SystemPromptPart)])
+    return compacted
+
+class Conversation:
+    """
+    State of one chat session: its message history and the product results of the
+    current turn, which the search tool hands to the endpoint through the run's deps.
+    """
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.messages = []
+        self.search_results = None
+        self.last_seen = time.time()
+        # Turns of the same session run one at a time
+        self.lock = asyncio.Lock()
+
+    def take_search_results(self):
+        """Return the results produced during this turn (if any) and clear them."""
+        results, self.search_results = self.search_results, None
+        return results
+
+class ConversationStore:
+    """
+    Chat sessions by id, bounded by count (least recently used are dropped first)
+    and by idle time (sessions unused for `ttl` seconds expire).
+    """
+
+    def __init__(self, max_sessions=1000, ttl=3600.0, max_turns=10):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.created = 0
+        self.expired = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self, now):
+        # Sessions are kept in last use order, so the idle ones are at the front
+        while self._sessions:
+            session_id, conversation = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or (self.ttl and now - conversation.last_seen > self.ttl):
+                del self._sessions[session_id]
+                self.expired += 1
+            else:
+                break
+
+    def get(self, session_id=None):
+        """Return the conversation of a session, starting a new one for unknown or expired ids."""
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            conversation = self._sessions.get(session_id) if session_id else None
+            if conversation is None:
+                conversation = Conversation(session_id or uuid.uuid4().hex)
+                self.created += 1
+            self._sessions[conversation.session_id] = conversation
+            self._sessions.move_to_end(conversation.session_id)
+            conversation.last_seen = now
+            self._evict(now)
+            return conversation
+
+    def save(self, conversation, messages):
+        """Store the messages of a finished turn, compacted for the next one."""
+        conversation.messages = compact_history(messages, self.max_turns)
+
+    def stats(self):
+        return {"sessions": len(self._sessions), "created": self.created, "expired": self.expired}
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_conversation_store():
+    """Return the process-wide conversation store, configured from the environment."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConversationStore(
+                max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", 1000)),
+                ttl=float(os.getenv("CHAT_SESSION_TTL_SECONDS", 3600)),
+                max_turns=int(os.getenv("CHAT_HISTORY_TURNS", 10)),
+            )
+        return _store
@@ -1,8 +1,10 @@
 import json
+import time
 from typing import Dict, Any, Optional, List
 from pydantic import BaseModel
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 import traceback
@@ -12,11 +14,28 @@ from pydantic_ai import Agent, RunContext
 # Load environment variables
 load_dotenv()
 
-from agents.common_models import GroceryList
-from retrieval.hybrid_retrieval import hybrid_product_retrieval, load_processed_data
-from utils.format_result import format_results_as_json, format_results_for_frontend
+from agents.common_models import GroceryItem, GroceryList
+from agents.conversation_store import Conversation, get_conversation_store
+from agents.substituicao import list_subs_agent
+from retrieval.catalog_store import get_catalog_store
+from retrieval.hybrid_retrieval import hybrid_product_retrieval, stream_product_retrieval
+import retrieval.telemetry  # registers the retrieval gauges served at /metrics
+from utils.compute_pool import get_compute_pool
+from utils.format_result import ResultFormatter
+from utils.metrics import REGISTRY, instrument_app, stats_gauges
+from utils.tracing import span
 
-app = FastAPI(title="Grocery Assistant API", description="API for grocery shopping assistance")
+#-------------------------------- Inicialização --------------------------------
+# The catalog is loaded once and reloaded in the background when the data files change
+catalog_store = get_catalog_store()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    catalog_store.start()
+    yield
+    catalog_store.stop()
+
+app = FastAPI(title="Grocery Assistant API", description="API for grocery shopping assistance", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -27,19 +46,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms and GET /metrics (Prometheus text format)
+instrument_app(app)
+
+# The HTTP histogram stops when the response starts, so streamed searches are timed here
+STREAM_FIRST_RESULT_SECONDS = REGISTRY.histogram(
+    "search_stream_first_result_seconds", "Time from the start of a streamed search to its first item event",
+)
+STREAM_SECONDS = REGISTRY.histogram(
+    "search_stream_duration_seconds", "Time to stream every event of a search, substitutions included",
+)
+
+@REGISTRY.collector
+def api_gauges():
+    return stats_gauges("api", "Catalog and chat session counters", {
+        "catalog": catalog_store.stats,
+        "sessions": conversations.stats,
+    })
+
 class MessageRequest(BaseModel):
     message: str
+    # Conversation to continue; a new one is started when omitted or expired
+    session_id: Optional[str] = None
 
-#-------------------------------- Inicialização --------------------------------
-df_with_embeddings, category_embeddings = load_processed_data()
+class SearchRequest(BaseModel):
+    items: List[str]
+    # Only search products sold in these markets (all markets when omitted)
+    markets: Optional[List[str]] = None
 
 #-------------------------------- Agente de compras --------------------------------
-thread = None
-product_search_response = None
+# Message history and search results of each chat session
+conversations = get_conversation_store()
 
 grocery_assistant = Agent(
     'openai:gpt-4o',  # Using a more capable model for the main agent
-    deps_type=None,
+    deps_type=Conversation,
     result_type=str,  # Simple string responses for user interaction
     system_prompt=(
         "Você é um assistente de compras inteligente. Você pode ajudar os usuários a:\n"
@@ -54,32 +95,31 @@ grocery_assistant = Agent(
 
 # Tool 1: Product Search
 @grocery_assistant.tool
-async def search_products(ctx: RunContext, grocery_list_json: str) -> Dict[str, Any]:
+async def search_products(ctx: RunContext[Conversation], grocery_list_json: str) -> Dict[str, Any]:
     """
     Busca produtos nos supermercados com base na lista de compras.
     Entrada esperada: lista de compras no formato JSON.
     """
-    global product_search_response
     try:
         # Parse the JSON string back to a GroceryList
         data = json.loads(grocery_list_json)
         grocery_list = GroceryList.model_validate(data)
         
-        # Load data and perform search
-        df_with_embeddings, category_embeddings = load_processed_data()
-        if df_with_embeddings is None or category_embeddings is None:
+        # Perform the search on the current catalog snapshot
+        catalog = catalog_store.current()
+        if catalog is None:
             return {"error": "Falha ao carregar dados de produtos"}
         
-        results = await hybrid_product_retrieval(grocery_list, df_with_embeddings, category_embeddings)
-        json_results, not_found = format_results_as_json(results)
-
-        # Format results for frontend
-        formatted_results = format_results_for_frontend(json_results)
-        product_search_response = formatted_results
+        results = await hybrid_product_retrieval(
+            grocery_list, catalog.df, catalog.category_embeddings, indexes=catalog.indexes
+        )
+        # Build the frontend view and the list of missing items in one pass, off the event loop
+        formatter = await get_compute_pool().run(ResultFormatter.from_results, results)
+        ctx.deps.search_results = formatter.markets()
         
         return {
             "results": results,
-            "not_found": not_found
+            "not_found": formatter.not_found
         }
     except Exception as e:
         return {"error": f"Erro ao buscar produtos: {str(e)}"}
@@ -107,41 +147,141 @@ async def suggest_dishes(ctx: RunContext, grocery_list: str) -> str:
         return f"Não foi possível gerar recomendações: {str(e)}"
 
 
+#-------------------------------- Busca em streaming --------------------------------
+
+def sse_event(event: str, data: Any) -> str:
+    """Encode one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def suggest_substitutions(missing_items: List[str]) -> List[str]:
+    """Ask the substitution agent for one replacement per item that was not found."""
+    if not missing_items:
+        return []
+    subs_response = await list_subs_agent.run(", ".join(missing_items))
+    return [item.name for item in subs_response.data.items if item.name]
+
+async def stream_search_events(grocery_list: GroceryList, catalog, markets: Optional[List[str]] = None):
+    """
+    Run the product search and yield SSE events as results become available.
+
+    Events, in order:
+        item: one per list item as soon as it is done, {"item", "markets"} with
+            "markets" in the frontend (MARKET_DATA) shape
+        substitutions: replacements for the items that were not found, same shape
+        summary: found/not found items and timings
+        error: sent instead of the remaining events if the search fails
+    """
+    started = time.perf_counter()
+    first_result_ms = None
+    found = []
+    not_found = []
+    substitution_items = []
+    total_matches = 0
+
+    try:
+        async for item_results in stream_product_retrieval(
+            grocery_list, catalog.df, catalog.category_embeddings, indexes=catalog.indexes, markets=markets
+        ):
+            if first_result_ms is None:
+                first_result_ms = (time.perf_counter() - started) * 1000
+                STREAM_FIRST_RESULT_SECONDS.observe(first_result_ms / 1000)
+
+            formatter = ResultFormatter(markets=markets)
+            products = formatter.add_matches(item_results.query_item, item_results)
+            total_matches += len(products)
+            (found if products else not_found).append(item_results.query_item)
+
+            yield sse_event("item", {
+                "item": item_results.query_item,
+                "markets": formatter.markets() if products else [],
+            })
+
+        substitution_items = await suggest_substitutions(not_found)
+        if substitution_items:
+            substitution_list = GroceryList(items=[GroceryItem(name=item) for item in substitution_items])
+            substitutions = ResultFormatter(markets=markets)
+            with span("substitution_retrieval", items=len(substitution_items)):
+                async for item_results in stream_product_retrieval(
+                    substitution_list, catalog.df, catalog.category_embeddings, indexes=catalog.indexes, markets=markets
+                ):
+                    if item_results.matches:
+                        substitutions.add_matches(item_results.query_item, item_results)
+
+            yield sse_event("substitutions", {
+                "items": substitution_items,
+                "markets": substitutions.markets() if substitutions.by_item else [],
+            })
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        STREAM_SECONDS.observe(elapsed_ms / 1000)
+        yield sse_event("summary", {
+            "found": found,
+            "not_found": not_found,
+            "substitute/changed": substitution_items,
+            "total_matches": total_matches,
+            "time_to_first_result_ms": first_result_ms,
+            "elapsed_ms": elapsed_ms,
+        })
+    except Exception as e:
+        print(traceback.format_exc())
+        yield sse_event("error", {"error": f"Erro ao buscar produtos: {str(e)}"})
+
+
 #-------------------------------- API --------------------------------
 
 
+@app.post("/search/stream")
+async def stream_search(request: SearchRequest):
+    """Stream product search results (text/event-stream) item by item."""
+    catalog = catalog_store.current()
+    if catalog is None:
+        raise HTTPException(status_code=503, detail="Falha ao carregar dados de produtos")
+
+    grocery_list = GroceryList(items=[GroceryItem(name=name) for name in request.items if name.strip()])
+    return StreamingResponse(
+        stream_search_events(grocery_list, catalog, request.markets),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/stats")
+async def stats():
+    """Catalog, chat session and compute pool counters (pool queue depth, busy time)."""
+    return {
+        "catalog": catalog_store.stats(),
+        "sessions": conversations.stats(),
+        "compute_pool": get_compute_pool().stats(),
+    }
+
+
 @app.post("/chat")
 async def create_grocery_list(request: MessageRequest):
-    global product_search_response
-    global thread
-    
-    if df_with_embeddings is None or category_embeddings is None:
+    if catalog_store.current() is None:
         return
-        
-    try:
-        # Use thread for context if it exists, otherwise start fresh
-        if thread is not None:
-            response = await grocery_assistant.run(request.message, message_history=thread)
-        else:
-            response = await grocery_assistant.run(request.message)
+    
+    conversation = conversations.get(request.session_id)
+    async with conversation.lock:
+        try:
+            # Continue the session's (compacted) history, if any
+            response = await grocery_assistant.run(
+                request.message,
+                message_history=conversation.messages or None,
+                deps=conversation,
+            )
+            conversations.save(conversation, response.all_messages())
             
-        # Store or update the thread from the response
-        thread = response.all_messages()
-        
-        if product_search_response is not None:
-            final_response = product_search_response
-            # Reset product_search_response after sending it
-            product_search_response = None
-        else:
-            final_response = response.data if hasattr(response, 'data') else str(response)
+            # Product results found during this turn are sent instead of the text answer
+            final_response = conversation.take_search_results()
+            if final_response is None:
+                final_response = response.data if hasattr(response, 'data') else str(response)
             
-        
-    except Exception as e:
-        return f"[red]Erro no processamento: {str(e)}[/]"
-
-
+        except Exception as e:
+            conversation.search_results = None
+            return f"[red]Erro no processamento: {str(e)}[/]"
 
-    return {"message": final_response}
+    return {"message": final_response, "session_id": conversation.session_id}
 
 
 
@@ -0,0 +1,74 @@
+"""
+Compare two benchmark result files, e.g. the base branch against a change:
+
+    python -m benchmarks.compare benchmarks/results/main.json benchmarks/results/head.json
+
+Exits with status 1 when a benchmark got slower than the threshold allows.
+"""
+import argparse
+import json
+import sys
+
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+
+def load_results(path):
+    """Results of a run keyed by (benchmark name, scale), with the run's metadata."""
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    return report["meta"], {(result["name"], result["scale"]): result for result in report["results"]}
+
+def compare(base, head, metric="median_ms", threshold=0.10):
+    """
+    Relative change of `metric` for every benchmark present in both runs.
+
+    Returns:
+        list: ``(name, scale, base value, head value, ratio, regressed)`` rows
+    """
+    rows = []
+    for key in sorted(base.keys() & head.keys(), key=lambda key: (key[1], key[0])):
+        before, after = base[key][metric], head[key][metric]
+        ratio = after / before if before else float('inf')
+        rows.append((key[0], key[1], before, after, ratio, ratio > 1 + threshold))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base", help="Results of the reference run")
+    parser.add_argument("head", help="Results of the run to check")
+    parser.add_argument("--metric", default="median_ms", choices=["min_ms", "median_ms", "mean_ms", "max_ms"])
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown tolerated before failing (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    base_meta, base = load_results(args.base)
+    head_meta, head = load_results(args.head)
+    if base_meta.get("parameters") != head_meta.get("parameters"):
+        console.print("[yellow]The runs used different parameters; timings may not be comparable[/]")
+
+    table = Table(title=f"{(base_meta.get('commit') or '?')[:10]} → {(head_meta.get('commit') or '?')[:10]} ({args.metric})")
+    table.add_column("Benchmark", style="cyan")
+    table.add_column("Products", justify="right")
+    table.add_column("Base", justify="right")
+    table.add_column("Head", justify="right")
+    table.add_column("Change", justify="right")
+
+    rows = compare(base, head, args.metric, args.threshold)
+    for name, scale, before, after, ratio, regressed in rows:
+        style = "red" if regressed else ("green" if ratio < 1 - args.threshold else "")
+        table.add_row(name, str(scale), f"{before:.2f}", f"{after:.2f}", f"[{style}]{ratio - 1:+.1%}[/]" if style else f"{ratio - 1:+.1%}")
+    console.print(table)
+
+    missing = (base.keys() ^ head.keys())
+    if missing:
+        console.print(f"[yellow]Only in one run: {', '.join(f'{name}@{scale}' for name, scale in sorted(missing))}[/]")
+
+    regressions = [row for row in rows if row[5]]
+    if regressions:
+        console.print(f"[red]{len(regressions)} benchmark(s) slower by more than {args.threshold:.0%}[/]")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
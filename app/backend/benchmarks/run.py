@@ -0,0 +1,268 @@
+"""
+Offline benchmarks of the retrieval pipeline.
+
+Synthetic catalogs are generated at each scale and searched with stub embedding and
+agent providers, so no API key or network access is needed. Results are written as
+JSON; compare two runs (e.g. of two commits) with `python -m benchmarks.compare`.
+
+    python -m benchmarks.run --scales 1000,10000,100000 --output benchmarks/results/head.json
+"""
+import os
+
+# The benchmark must not read or fill the on-disk caches; set before the stores are created
+for _name in ("EMBEDDING_CACHE_PATH", "CONTEXT_STORE_PATH", "FILTER_CACHE_PATH", "FILTER_GATE_RECORD_PATH"):
+    os.environ[_name] = ""
+# The agents are created at import time and need a key, which the stubs never use
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+
+from agents.common_models import GroceryItem, GroceryList
+from agents.context_expansion_agent import context_expansion_agent
+from benchmarks.stubs import StubEmbeddingProvider, stub_agents
+from benchmarks.synthetic import build_processed_catalog, generate_catalog, shopping_list, stub_vector, write_catalog
+from retrieval.context_store import get_context_store
+from retrieval.filter_cache import get_filter_cache
+from retrieval.hybrid_retrieval import (
+    calculate_similarities, hybrid_product_retrieval, load_processed_data, process_item, rank_item
+)
+from retrieval.indexes import CatalogIndexes, get_catalog_indexes
+from retrieval.query_plan import QueryPlan, category_query, description_query
+from utils.embedding_cache import EmbeddingCache
+from utils.embedding_provider import set_embedding_provider
+from utils.format_result import ResultFormatter, format_results_as_json, format_results_for_frontend
+
+console = Console()
+
+# Bumped when benchmarks are added, removed or change what they measure
+SCHEMA_VERSION = 1
+
+
+def quiet_consoles():
+    """Silence the rich consoles of the pipeline modules, so printing is not timed."""
+    for module in list(sys.modules.values()):
+        module_console = getattr(module, 'console', None)
+        if module_console is not console and isinstance(module_console, Console):
+            module_console.quiet = True
+
+def summarize(name, scale, samples, **extra):
+    """Timing statistics (milliseconds) of one benchmark at one scale."""
+    samples_ms = [sample * 1000 for sample in samples]
+    return {
+        "name": name,
+        "scale": scale,
+        "repeats": len(samples_ms),
+        "min_ms": min(samples_ms),
+        "median_ms": statistics.median(samples_ms),
+        "mean_ms": statistics.fmean(samples_ms),
+        "max_ms": max(samples_ms),
+        **extra,
+    }
+
+def time_call(fn, repeats, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+async def time_async(fn, repeats, warmup=1, before=None):
+    """Time ``await fn()``; `before` (untimed) runs ahead of every call, e.g. to clear caches."""
+    for _ in range(warmup):
+        if before:
+            before()
+        await fn()
+    samples = []
+    for _ in range(repeats):
+        if before:
+            before()
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def reset_caches(provider):
+    """Forget every memoized embedding, expanded context and filter verdict."""
+    provider.cache = EmbeddingCache(path=None)
+    get_context_store().memory.clear()
+    get_filter_cache().memory.clear()
+
+async def bench_scale(scale, args, workdir):
+    """Run every benchmark on a synthetic catalog of `scale` products."""
+    results = []
+
+    catalog_path = write_catalog(
+        generate_catalog(scale, args.markets, args.categories, args.markets_per_product, args.seed),
+        os.path.join(workdir, f"catalog_{scale}.json"),
+    )
+    catalog_dir = os.path.join(workdir, f"catalog_{scale}")
+    build_processed_catalog(catalog_path, catalog_dir, args.dim)
+    missing = os.path.join(workdir, "missing.pkl")
+
+    # Catalog load: open the memory-mapped artifact, then build the indexes it defers
+    results.append(summarize("load_processed_data", scale, time_call(
+        lambda: load_processed_data(missing, missing, ann_path=None, catalog_dir=catalog_dir), args.repeats
+    )))
+    df, category_embeddings = load_processed_data(missing, missing, ann_path=None, catalog_dir=catalog_dir)
+    indexes = get_catalog_indexes(df, category_embeddings)
+    results.append(summarize("build_indexes", scale, time_call(
+        lambda: CatalogIndexes(df, category_embeddings, product_index=indexes.product_index,
+                               version=indexes.version).warm(), args.repeats
+    )))
+    indexes.warm()
+
+    provider = StubEmbeddingProvider(args.dim, args.embedding_latency, args.embedding_latency_per_input)
+    set_embedding_provider(provider)
+    items = [GroceryItem(name=name) for name in shopping_list(args.items, args.seed)]
+    grocery_list = GroceryList(items=items)
+
+    with stub_agents(df, args.agent_latency):
+        contexts = [(await context_expansion_agent.run(item.name)).data for item in items]
+
+        # process_item stages, each timed over the whole list
+        suggestion_vectors = [
+            np.stack([stub_vector(category_query(category), args.dim) for category in context.possible_categories])
+            if context.possible_categories else None
+            for context in contexts
+        ]
+        description_vectors = [stub_vector(description_query(item.name, context), args.dim)
+                               for item, context in zip(items, contexts)]
+        matched = [indexes.category_matcher.match(vectors, 0.75, 0.6) if vectors is not None else []
+                   for vectors in suggestion_vectors]
+        category_rows = [indexes.category_index.rows(categories) if categories else np.arange(len(df))
+                         for categories in matched]
+        keywords = [[item.name] + (context.possible_synonyms or []) for item, context in zip(items, contexts)]
+        keyword_rows = [indexes.keyword_index.search(words, rows) for words, rows in zip(keywords, category_rows)]
+        candidate_rows = [found if len(found) else rows for found, rows in zip(keyword_rows, category_rows)]
+        candidates = int(sum(len(rows) for rows in candidate_rows))
+
+        stages = {
+            "stage.category_match": lambda: [indexes.category_matcher.match(vectors, 0.75, 0.6)
+                                             for vectors in suggestion_vectors if vectors is not None],
+            "stage.category_rows": lambda: [indexes.category_index.rows(categories)
+                                            for categories in matched if categories],
+            "stage.keyword_prefilter": lambda: [indexes.keyword_index.search(words, rows)
+                                                for words, rows in zip(keywords, category_rows)],
+            "stage.similarity": lambda: [calculate_similarities(vector, indexes.product_index, rows)
+                                         for vector, rows in zip(description_vectors, candidate_rows)],
+            "stage.rank_item": lambda: [rank_item(item, df, indexes, context, categories, vector)
+                                        for item, context, categories, vector
+                                        in zip(items, contexts, matched, description_vectors)],
+        }
+        for name, stage in stages.items():
+            results.append(summarize(name, scale, time_call(stage, args.repeats), items=len(items), candidates=candidates))
+
+        # process_item for the whole list, concurrently, with warm query embeddings
+        async def process_list():
+            query_plan = QueryPlan(provider, items=len(items))
+            return await asyncio.gather(*(
+                process_item(item, df, indexes, provider, context, query_plan=query_plan)
+                for item, context in zip(items, contexts)
+            ))
+        results.append(summarize("process_item", scale, await time_async(process_list, args.repeats), items=len(items)))
+
+        # The whole pipeline: expansion, ranking and filtering, without and with warm caches
+        async def retrieve():
+            return await hybrid_product_retrieval(grocery_list, df, category_embeddings, indexes=indexes)
+        results.append(summarize("hybrid_product_retrieval.cold", scale, await time_async(
+            retrieve, args.repeats, before=lambda: reset_caches(provider)
+        ), items=len(items)))
+        results.append(summarize("hybrid_product_retrieval.warm", scale, await time_async(retrieve, args.repeats),
+                                 items=len(items)))
+        retrieval_results = await retrieve()
+
+    # Formatting of the final results
+    json_results, _ = format_results_as_json(retrieval_results)
+    matches = sum(len(products) for products in json_results.values())
+    formatting = {
+        "format_results_as_json": lambda: format_results_as_json(retrieval_results),
+        "format_results_for_frontend": lambda: format_results_for_frontend(json_results),
+        "result_formatter": lambda: ResultFormatter.from_results(retrieval_results).markets(),
+    }
+    for name, fn in formatting.items():
+        results.append(summarize(name, scale, time_call(fn, args.repeats), matches=matches))
+
+    return results
+
+def run_metadata(args):
+    """Where and on what the benchmarks ran, to tell comparable runs apart."""
+    def git(*command):
+        try:
+            return subprocess.run(["git", *command], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+    }
+
+def print_results(results):
+    table = Table(title="Benchmarks")
+    table.add_column("Benchmark", style="cyan")
+    table.add_column("Products", justify="right")
+    table.add_column("Median (ms)", justify="right", style="green")
+    table.add_column("Min (ms)", justify="right")
+    table.add_column("Max (ms)", justify="right")
+    for result in results:
+        table.add_row(result["name"], str(result["scale"]), f"{result['median_ms']:.2f}",
+                      f"{result['min_ms']:.2f}", f"{result['max_ms']:.2f}")
+    console.print(table)
+
+async def main(args):
+    quiet_consoles()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as workdir:
+        for scale in args.scales:
+            console.print(f"[bold blue]Benchmarking {scale} products...[/]")
+            results.extend(await bench_scale(scale, args, workdir))
+
+    report = {"meta": run_metadata(args), "results": results}
+    print_results(results)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        console.print(f"[green]Results written to {args.output}[/]")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the retrieval pipeline")
+    parser.add_argument("--scales", type=lambda value: [int(n) for n in value.split(',')], default=[1000, 10000, 50000],
+                        help="Comma-separated catalog sizes (products)")
+    parser.add_argument("--markets", type=int, default=20)
+    parser.add_argument("--categories", type=int, default=200)
+    parser.add_argument("--markets-per-product", type=int, default=3)
+    parser.add_argument("--dim", type=int, default=256, help="Embedding dimension")
+    parser.add_argument("--items", type=int, default=10, help="Items in the shopping list")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Seconds added to every embedding request")
+    parser.add_argument("--embedding-latency-per-input", type=float, default=0.0, help="Seconds added per embedded text")
+    parser.add_argument("--agent-latency", type=float, default=0.0, help="Seconds added to every agent call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmarks/results/latest.json", help="JSON file for the results")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,102 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+
+import numpy as np
+from pydantic_ai.messages import ModelResponse, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import FunctionModel
+
+from agents.context_expansion_agent import context_expansion_agent
+from agents.product_filter_agent import product_filter_agent
+from benchmarks.synthetic import VARIANTS, stub_vector
+from retrieval.keyword_index import fold_text
+from utils.embedding_cache import EMBEDDING_MODEL, EmbeddingCache
+from utils.embedding_provider import EmbeddingProvider
+from utils.tracing import span
+
+
+class StubEmbeddingProvider(EmbeddingProvider):
+    """
+    Embedding provider answering with deterministic stub vectors after a simulated delay.
+
+    Requests still go through the provider's concurrency limit and embedding cache
+    (in memory only), so batching and caching behave as with the real API.
+    """
+
+    def __init__(self, dim=256, latency=0.0, latency_per_input=0.0, max_concurrency=8):
+        super().__init__(max_concurrency=max_concurrency, cache=EmbeddingCache(path=None))
+        self.dim = dim
+        self.latency = latency
+        self.latency_per_input = latency_per_input
+
+    async def create(self, texts, model=EMBEDDING_MODEL):
+        async with self._state().semaphore:
+            with span("embedding", inputs=len(texts), model=model):
+                self.requests += 1
+                await asyncio.sleep(self.latency + self.latency_per_input * len(texts))
+                return np.stack([stub_vector(text, self.dim) for text in texts])
+
+def _choice(text, n):
+    """Stable pick in range(n) for a text."""
+    return int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:4], 'little') % n
+
+def _user_prompt(messages):
+    return next(part.content for part in messages[-1].parts if isinstance(part, UserPromptPart))
+
+def _result(info, args):
+    return ModelResponse(parts=[ToolCallPart(info.result_tools[0].name, args)])
+
+def context_expansion_model(df, latency=0.0, categories_per_item=3):
+    """
+    Stub model for the context expansion agent.
+
+    Items are expanded with a synonym, a description and the categories of the
+    catalog products whose name starts with the item, as a good answer would be.
+    """
+    categories_by_word = {}
+    for name, value in zip(df['nome_produto'], df['categoria']):
+        categories = categories_by_word.setdefault(fold_text(name.split()[0]), {})
+        for category in value.split('|'):
+            categories[category] = None
+
+    async def expand(messages, info):
+        await asyncio.sleep(latency)
+        item_name = _user_prompt(messages)
+        word = fold_text(item_name.split()[0]) if item_name.split() else ""
+        categories = list(categories_by_word.get(word, {}))
+        start = _choice(item_name, len(categories)) if categories else 0
+        return _result(info, {
+            "name": item_name,
+            "possible_synonyms": [f"{item_name} {VARIANTS[_choice(item_name, len(VARIANTS))].lower()}"],
+            "possible_categories": (categories[start:] + categories[:start])[:categories_per_item],
+            "description": f"{item_name} de qualidade",
+        })
+
+    return FunctionModel(expand)
+
+def product_filter_model(latency=0.0, keep=0.7):
+    """Stub model for the product filter agent: keeps the first `keep` fraction of the products."""
+    async def filter_products(messages, info):
+        await asyncio.sleep(latency)
+        payload = json.loads(_user_prompt(messages))
+        matches = payload["matches"]
+        kept = matches[:max(1, int(len(matches) * keep))] if matches else []
+        return _result(info, {
+            # Only the ids are used; the other fields are required by the schema
+            "matches": [
+                {"product_id": match["product_id"], "name": match["name"], "price": 0.0,
+                 "description": match["description"], "category": match["category"],
+                 "similarity": 0.0, "nome_mercado": ""}
+                for match in kept
+            ]
+        })
+
+    return FunctionModel(filter_products)
+
+@contextlib.contextmanager
+def stub_agents(df, latency=0.0):
+    """Replace the models of the agents used by the retrieval with stub models."""
+    with context_expansion_agent.override(model=context_expansion_model(df, latency)), \
+            product_filter_agent.override(model=product_filter_model(latency)):
+        yield
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from retrieval.catalog_artifact import write_catalog_artifact
+from utils.catalog_ingest import ingest_catalog
+from utils.embedding_cache import normalize_text
+
+# Words the synthetic product names (and the benchmark shopping lists) are made of
+PRODUCT_WORDS = [
+    "Leite", "Arroz", "Feijão", "Café", "Açúcar", "Óleo", "Farinha", "Macarrão", "Molho", "Biscoito",
+    "Pão", "Queijo", "Presunto", "Manteiga", "Iogurte", "Sabão", "Detergente", "Refrigerante", "Suco", "Água",
+    "Cerveja", "Vinho", "Frango", "Carne", "Linguiça", "Banana", "Maçã", "Tomate", "Cebola", "Batata",
+]
+VARIANTS = ["Integral", "Light", "Tradicional", "Premium", "Orgânico", "Zero", "Extra", "Caseiro"]
+SIZES = ["200g", "500g", "1kg", "2kg", "350ml", "1L", "2L", "12un"]
+
+
+def stub_vector(text, dim):
+    """Unit vector derived from the normalized text (the same for the same text in every run)."""
+    seed = int.from_bytes(hashlib.sha256(normalize_text(text).encode('utf-8')).digest()[:8], 'little')
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+def category_names(categories):
+    """`categories` department|aisle strings, e.g. "Departamento 3|Corredor 17"."""
+    departments = max(1, categories // 8)
+    return [f"Departamento {i % departments}|Corredor {i}" for i in range(categories)]
+
+def generate_catalog(products=10_000, markets=20, categories=200, markets_per_product=3, seed=0):
+    """
+    Build a synthetic catalog in the catalog.json schema.
+
+    Every product is sold in `markets_per_product` random markets, so the ingested
+    catalog has about `products` unique products.
+
+    Returns:
+        list: Markets, each ``{"nome_mercado": ..., "produtos": [...]}``
+    """
+    rng = np.random.default_rng(seed)
+    category_list = category_names(categories)
+    catalog = [{"nome_mercado": f"Mercado {i}", "produtos": []} for i in range(markets)]
+
+    for i in range(products):
+        word = PRODUCT_WORDS[i % len(PRODUCT_WORDS)]
+        name = f"{word} {VARIANTS[rng.integers(len(VARIANTS))]} Marca {i} {SIZES[rng.integers(len(SIZES))]}"
+        product = {
+            "nome_produto": name,
+            "preco": round(float(rng.uniform(1, 100)), 2),
+            "descricao": f"{word.lower()} {name.lower()} de qualidade",
+            "categoria": category_list[(i * 7 + int(rng.integers(3))) % len(category_list)],
+        }
+        for market in rng.choice(markets, size=min(markets_per_product, markets), replace=False):
+            catalog[market]["produtos"].append(product)
+    return catalog
+
+def write_catalog(catalog, path):
+    """Write a generated catalog as a catalog.json file."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, ensure_ascii=False)
+    return path
+
+def build_processed_catalog(catalog_path, catalog_dir, dim=256):
+    """
+    Ingest a catalog.json file and write its memory-mapped artifact, as preprocess_data
+    does, with stub vectors instead of API embeddings.
+
+    Returns:
+        tuple: (products DataFrame, category embeddings dict)
+    """
+    df = ingest_catalog(catalog_path, workers=1).dataframe()
+    texts = (df['nome_produto'] + " " + df['descricao'] + " " + df['categoria']).tolist()
+    df['embedding'] = [stub_vector(text, dim) for text in texts]
+
+    categories = sorted({category for value in df['categoria'] for category in value.split('|')})
+    category_embeddings = {category: stub_vector(f"categoria: {category}", dim) for category in categories}
+
+    os.makedirs(catalog_dir, exist_ok=True)
+    write_catalog_artifact(df, category_embeddings, catalog_dir)
+    return df, category_embeddings
+
+def shopping_list(items, seed=0):
+    """Item names for a benchmark shopping list, drawn from the product words."""
+    rng = np.random.default_rng(seed)
+    names = [word.lower() for word in PRODUCT_WORDS]
+    return [names[i] for i in rng.permutation(len(names))[:items]] if items <= len(names) \
+        else [f"{names[i % len(names)]} {i}" for i in range(items)]
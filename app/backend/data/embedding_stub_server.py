@@ -0,0 +1,101 @@
+"""
+Local stand-in for the OpenAI embeddings endpoint, to measure preprocessing throughput.
+
+Start it and point the embedding provider at it:
+
+    python data/embedding_stub_server.py --latency 0.2 --rate-limit 0.05
+    EMBEDDING_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub python data/preprocess_data.py --full
+
+Vectors are deterministic per text, so repeated runs produce the same catalog.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import random
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def stub_vector(text, dim):
+    """Unit vector derived from the text, identical across runs."""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+def create_app(dim=3072, latency=0.0, latency_per_input=0.0, rate_limit=0.0):
+    """
+    Build the stub app.
+
+    Args:
+        dim (int): Size of the returned vectors
+        latency (float): Seconds added to every request
+        latency_per_input (float): Seconds added per input text
+        rate_limit (float): Fraction of requests answered with 429 and a Retry-After
+    """
+    app = FastAPI(title="Embedding stub")
+    app.state.requests = 0
+    app.state.inputs = 0
+    app.state.rate_limited = 0
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        app.state.requests += 1
+
+        if rate_limit and random.random() < rate_limit:
+            app.state.rate_limited += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": "0.5"},
+            )
+
+        await asyncio.sleep(latency + latency_per_input * len(inputs))
+        app.state.inputs += len(inputs)
+
+        data = []
+        for i, text in enumerate(inputs):
+            vector = stub_vector(text, dim)
+            embedding = (base64.b64encode(vector.tobytes()).decode('ascii')
+                         if body.get("encoding_format") == "base64" else vector.tolist())
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+        tokens = sum(len(text) // 4 + 1 for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "stub"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            "requests": app.state.requests,
+            "inputs": app.state.inputs,
+            "rate_limited": app.state.rate_limited,
+        }
+
+    return app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub OpenAI embeddings server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--latency-per-input", type=float, default=0.0, help="Seconds added per input text")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of requests answered with 429")
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(args.dim, args.latency, args.latency_per_input, args.rate_limit),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
@@ -0,0 +1,56 @@
+import argparse
+import json
+import os
+import sys
+from dotenv import load_dotenv
+from rich.console import Console
+from rich.table import Table
+
+# Load environment variables from .env file (before the agents are imported)
+load_dotenv()
+
+# Allow running as `python data/filter_gate_report.py` from the backend root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.common_models import RankingSignals
+from retrieval.filter_gate import agreement_report, filter_confidence
+
+# Initialize Rich console for better output formatting
+console = Console()
+
+def load_records(path):
+    """Load recorded filter decisions, recomputing confidence with the current scoring."""
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    
+    for record in records:
+        record["confidence"] = filter_confidence(RankingSignals.model_validate(record["signals"]))
+    
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description="Agreement between the filter gate and recorded LLM filter decisions")
+    parser.add_argument("records", help="JSONL file written with FILTER_GATE_RECORD_PATH")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 0.9])
+    args = parser.parse_args()
+    
+    records = load_records(args.records)
+    
+    table = Table(title=f"Filter gate vs LLM ({len(records)} recorded items)")
+    table.add_column("Threshold")
+    table.add_column("Skip rate", style="cyan")
+    table.add_column("Agreement", style="green")
+    table.add_column("LLM kept", style="yellow")
+    
+    for row in agreement_report(records, args.thresholds):
+        table.add_row(
+            f"{row['threshold']:.2f}",
+            f"{row['skip_rate']:.1%}",
+            "-" if row["agreement"] is None else f"{row['agreement']:.1%}",
+            "-" if row["kept_fraction"] is None else f"{row['kept_fraction']:.1%}",
+        )
+    
+    console.print(table)
+
+if __name__ == "__main__":
+    main()
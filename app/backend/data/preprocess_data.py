@@ -1,13 +1,24 @@
-import json
-import pandas as pd
+import argparse
+import asyncio
+import hashlib
 import numpy as np
 import pickle
-from openai import OpenAI
-from sklearn.metrics.pairwise import cosine_similarity
 from dotenv import load_dotenv
 import os
+import sys
 from rich.console import Console
-from rich.panel import Panel
+from rich.table import Table
+
+# Allow running as `python data/preprocess_data.py` from the backend root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retrieval.ann_index import IVFIndex, recall_at_k
+from retrieval.catalog_artifact import DEFAULT_CATALOG_DIR, CatalogArtifact, write_catalog_artifact
+from retrieval.product_index import ProductIndex
+from utils.batch_embedding import DEFAULT_BATCH_TOKENS, EmbeddingCheckpoint, embed_in_batches
+from utils.catalog_ingest import catalog_files, ingest_catalog
+from utils.embedding_cache import EMBEDDING_MODEL
+from utils.embedding_provider import get_embedding_provider
 
 # Initialize Rich console for better output formatting
 console = Console()
@@ -15,33 +26,21 @@ console = Console()
 # Load environment variables from .env file
 load_dotenv()
 
-def preprocess_catalog(catalog_path='catalog/catalog.json'):
-    """Load and preprocess the product catalog."""
+def preprocess_catalog(catalog_path='catalog/catalog.json', workers=None):
+    """
+    Load and preprocess the product catalog.
+    
+    `catalog_path` is a catalog.json file, or a directory of *.json files with the
+    same format (e.g. one per market shard) that are parsed in parallel.
+    """
     console.print("[bold blue]Preprocessing catalog data...[/]")
     
-    # Load the catalog data
-    with open(catalog_path, 'r', encoding='utf-8') as f:
-        catalog = json.load(f)
-    
-    # First pass: collect all products with their market names
-    products_dict = {}
-    for market in catalog:
-        for product in market['produtos']:
-            product_name = product['nome_produto']
-            if product_name not in products_dict:
-                # Create a copy of the product dictionary
-                product_with_market = product.copy()
-                product_with_market['nome_mercado'] = market['nome_mercado']
-                products_dict[product_name] = product_with_market
-            else:
-                # Add the market name to the existing product's markets
-                products_dict[product_name]['nome_mercado'] += f"|{market['nome_mercado']}"
-    
-    # Convert the dictionary to a list of products
-    products = list(products_dict.values())
+    # Stream the markets and products, collecting unique products and their markets
+    catalog = ingest_catalog(catalog_path, workers)
+    console.print(f"[green]Read {len(catalog.markets)} markets from {len(catalog_files(catalog_path))} file(s)[/]")
     
     # Create a DataFrame
-    df = pd.DataFrame(products)
+    df = catalog.dataframe()
     
     # Remove duplicate products
     df = df.drop_duplicates()
@@ -58,64 +57,150 @@ def preprocess_catalog(catalog_path='catalog/catalog.json'):
     
     return df, all_categories
 
-def get_embeddings_client():
-    """Initialize and return the OpenAI client for embeddings."""
-    return OpenAI()
+def embedding_texts(df):
+    """Exact text embedded for each product: name, description and category."""
+    # Combine name, description and category for better semantic representation
+    return (df['nome_produto'] + " " + 
+            df['descricao'] + " " + 
+            df['categoria']).tolist()
+
+def content_hash(text, model=EMBEDDING_MODEL):
+    """Hash identifying an embedding: same model and same text give the same vector."""
+    return hashlib.sha256(f"{model}\n{text}".encode('utf-8')).hexdigest()
+
+def open_previous_artifact(catalog_dir=DEFAULT_CATALOG_DIR):
+    """Return the current catalog artifact, whose vectors can be reused, or None."""
+    try:
+        return CatalogArtifact.open(catalog_dir)
+    except (OSError, ValueError) as e:
+        console.print(f"[yellow]Previous catalog artifact not usable ({e}), embedding everything[/]")
+        return None
+
+def report_reuse(title, reused, new, removed):
+    """Print how many embeddings were reused, generated and dropped."""
+    table = Table(title=title)
+    table.add_column("Reused", style="green")
+    table.add_column("New/changed", style="yellow")
+    table.add_column("Removed", style="red")
+    table.add_row(str(reused), str(new), str(removed))
+    console.print(table)
 
-def generate_embeddings(df, client, batch_size=100):
-    """Generate embeddings for products in the DataFrame."""
+async def generate_embeddings(df, provider, previous=None, checkpoint=None, batch_tokens=DEFAULT_BATCH_TOKENS):
+    """
+    Generate embeddings for products in the DataFrame.
+    
+    Rows whose embedded text is unchanged since the previous artifact reuse its
+    vectors; only new or changed texts are sent to the API, in concurrent
+    token-sized batches checkpointed as they finish. The content hash of every row
+    is kept in the `embedding_hash` column for the next run.
+    """
     console.print("[bold blue]Generating embeddings for products...[/]")
     
-    embeddings_data = []
-    
-    for i in range(0, len(df), batch_size):
-        batch = df.iloc[i:i+batch_size]
-        
-        # Combine name, description and category for better semantic representation
-        texts = (batch['nome_produto'] + " " + 
-                 batch['descricao'] + " " + 
-                 batch['categoria']).tolist()
-        
-        console.print(f"Processing batch {i//batch_size + 1}/{(len(df)+batch_size-1)//batch_size}")
-        
-        batch_embeddings = client.embeddings.create(
-            input=texts, 
-            model="text-embedding-3-large"
-        ).data
-        
-        embeddings_data.extend(batch_embeddings)
+    texts = embedding_texts(df)
+    hashes = [content_hash(text) for text in texts]
+    
+    # Row of each hash in the previous artifact
+    previous_rows = {}
+    if previous is not None and 'embedding_hash' in previous.manifest['columns']:
+        previous_hashes = previous.dataframe(columns=['embedding_hash'])['embedding_hash']
+        previous_rows = {h: row for row, h in enumerate(previous_hashes)}
+    
+    embeddings_data = [None] * len(df)
+    reused = [pos for pos, h in enumerate(hashes) if h in previous_rows]
+    if reused:
+        vectors = np.array(previous.embeddings[[previous_rows[hashes[pos]] for pos in reused]], dtype=np.float32)
+        for pos, vector in zip(reused, vectors):
+            embeddings_data[pos] = vector
+    
+    # Embed each new text once, even if several rows share it
+    missing = {}
+    for pos, h in enumerate(hashes):
+        if embeddings_data[pos] is None:
+            missing.setdefault(h, texts[pos])
+    fresh, _ = await embed_in_batches(missing, provider, checkpoint=checkpoint, max_tokens=batch_tokens)
+    
+    for pos, h in enumerate(hashes):
+        if embeddings_data[pos] is None:
+            embeddings_data[pos] = fresh[h]
     
     # Add embeddings to DataFrame
     df['embedding'] = embeddings_data
+    df['embedding_hash'] = hashes
     console.print("[green]Embeddings generation complete[/]")
+    report_reuse(
+        "Product embeddings",
+        reused=len(reused),
+        new=len(df) - len(reused),
+        removed=len(set(previous_rows) - set(hashes))
+    )
     
     return df
 
-def generate_category_embeddings(categories, client):
-    """Generate embeddings for categories."""
+async def generate_category_embeddings(categories, provider, previous=None, checkpoint=None,
+                                       batch_tokens=DEFAULT_BATCH_TOKENS):
+    """Generate embeddings for categories, reusing those of the previous artifact."""
     console.print("[bold blue]Generating embeddings for categories...[/]")
     
+    categories = list(categories)
+    previous_embeddings = {}
+    if previous is not None and previous.embedding_model == EMBEDDING_MODEL:
+        previous_embeddings = previous.category_embeddings()
+    
     # Create context for categories to improve embedding quality
-    category_contexts = [f"categoria: {cat}" for cat in categories]
+    missing = [cat for cat in categories if cat not in previous_embeddings]
+    category_contexts = {content_hash(f"categoria: {cat}"): f"categoria: {cat}" for cat in missing}
     
-    # Get embeddings
-    embeddings = client.embeddings.create(
-        input=category_contexts,
-        model="text-embedding-3-large"
-    ).data
+    # Get embeddings in token-sized batches, like the products
+    fresh, _ = await embed_in_batches(category_contexts, provider, checkpoint=checkpoint, max_tokens=batch_tokens)
     
     # Create a dictionary mapping categories to their embeddings
     category_embeddings = {
-        cat: np.array(emb.embedding) 
-        for cat, emb in zip(categories, embeddings)
+        cat: fresh[content_hash(f"categoria: {cat}")] if cat in missing
+        else np.array(previous_embeddings[cat], dtype=np.float32)
+        for cat in categories
     }
     
     console.print(f"[green]Generated embeddings for {len(category_embeddings)} categories[/]")
+    report_reuse(
+        "Category embeddings",
+        reused=len(categories) - len(missing),
+        new=len(missing),
+        removed=len(set(previous_embeddings) - set(categories))
+    )
     
     return category_embeddings
 
-def save_processed_data(df, category_embeddings, df_path='data/processed_df.pkl', cat_path='data/category_embeddings.pkl'):
-    """Save the processed dataframe and category embeddings to disk."""
+def build_ann_index(df, category_embeddings, n_lists=None, nprobe_values=(1, 2, 4, 8, 16, 32), k=10):
+    """
+    Build the ANN index used by the full-catalog fallback and report its recall against exact search.
+    
+    The index is saved with the catalog artifact (see save_processed_data), so it is
+    published together with the vectors it was built on.
+    """
+    console.print("[bold blue]Building ANN index...[/]")
+    
+    product_index = ProductIndex.from_dataframe(df)
+    ann_index = IVFIndex.build(product_index.matrix, n_lists=n_lists)
+    
+    # Category embeddings ("categoria: ...") are short texts, close to real queries
+    queries = np.array(list(category_embeddings.values())[:200], dtype=np.float32)
+    
+    table = Table(title=f"ANN recall@{k} ({ann_index.n_lists} lists, {len(queries)} queries)")
+    table.add_column("nprobe")
+    table.add_column("Recall", style="green")
+    table.add_column("Catalog scanned", style="yellow")
+    for nprobe in nprobe_values:
+        if nprobe > ann_index.n_lists:
+            break
+        report = recall_at_k(ann_index, product_index, queries, k=k, nprobe=nprobe)
+        table.add_row(str(nprobe), f"{report['recall']:.3f}", f"{report['scanned']:.1%}")
+    console.print(table)
+    
+    return ann_index
+
+def save_processed_data(df, category_embeddings, df_path='data/processed_df.pkl', cat_path='data/category_embeddings.pkl',
+                        catalog_dir=DEFAULT_CATALOG_DIR, ann_index=None):
+    """Save the processed dataframe and category embeddings to disk (pickles and catalog artifact, with its ANN index)."""
     console.print("[bold blue]Saving processed data to disk...[/]")
     
     # Create data directory if it doesn't exist
@@ -130,25 +215,54 @@ def save_processed_data(df, category_embeddings, df_path='data/processed_df.pkl'
         pickle.dump(category_embeddings, f)
     
     console.print(f"[green]Data saved successfully to {df_path} and {cat_path}[/]")
+    
+    # Memory-mapped artifact read by load_processed_data
+    artifact_path = write_catalog_artifact(df, category_embeddings, catalog_dir, ann_index=ann_index)
+    console.print(f"[green]Catalog artifact written to {artifact_path}[/]")
 
-def main():
+async def main(full=False, checkpoint_path='data/embedding_checkpoint.sqlite', batch_tokens=DEFAULT_BATCH_TOKENS,
+               catalog_path='catalog/catalog.json', workers=None):
     # Initialize
     console.print("[bold blue]Starting data preprocessing...[/]")
     
     # Preprocess data
-    df, all_categories = preprocess_catalog()
+    df, all_categories = preprocess_catalog(catalog_path, workers)
+    
+    # Get the shared embedding provider
+    provider = get_embedding_provider()
+    
+    # Vectors of unchanged products and categories are taken from the last run
+    previous = None if full else open_previous_artifact()
     
-    # Get embeddings client
-    client = get_embeddings_client()
+    # Finished batches are checkpointed, so an interrupted run picks up where it stopped
+    checkpoint = EmbeddingCheckpoint(checkpoint_path)
     
     # Generate embeddings
-    df_with_embeddings = generate_embeddings(df, client)
-    category_embeddings = generate_category_embeddings(all_categories, client)
+    df_with_embeddings = await generate_embeddings(df, provider, previous, checkpoint, batch_tokens)
+    category_embeddings = await generate_category_embeddings(all_categories, provider, previous, checkpoint, batch_tokens)
     
-    # Save the processed data
-    save_processed_data(df_with_embeddings, category_embeddings)
+    # Build the optional ANN index for the full-catalog fallback, before anything is published
+    ann_index = build_ann_index(df_with_embeddings, category_embeddings)
+    
+    # Save the processed data (the artifact version and its ANN index are published together)
+    save_processed_data(df_with_embeddings, category_embeddings, ann_index=ann_index)
+    checkpoint.remove()
     
     console.print("[bold green]Preprocessing complete![/]")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Preprocess the catalog and generate its embeddings")
+    parser.add_argument("--full", action="store_true", help="Re-embed every product and category instead of reusing the previous artifact")
+    parser.add_argument("--checkpoint", default='data/embedding_checkpoint.sqlite', help="File keeping finished batches of an interrupted run")
+    parser.add_argument("--batch-tokens", type=int, default=DEFAULT_BATCH_TOKENS, help="Estimated tokens per embedding request")
+    parser.add_argument("--catalog", default='catalog/catalog.json', help="Catalog file, or directory of catalog shard files")
+    parser.add_argument("--workers", type=int, default=None, help="Processes parsing catalog shards (default: one per core)")
+    args = parser.parse_args()
+    
+    asyncio.run(main(
+        full=args.full,
+        checkpoint_path=args.checkpoint,
+        batch_tokens=args.batch_tokens,
+        catalog_path=args.catalog,
+        workers=args.workers
+    ))
@@ -3,8 +3,11 @@ from pydantic import BaseModel
 from main import main, get_recomendation
 from agents.disambiguation_agent import disambiguation_agent
 from typing import Optional
+import retrieval.telemetry  # registers the retrieval gauges served at /metrics
+from utils.metrics import instrument_app
 
 app = FastAPI()
+instrument_app(app)
 
 
 # Definindo o modelo esperado no corpo da requisição
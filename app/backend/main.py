@@ -1,5 +1,4 @@
 import asyncio
-import json
 import traceback
 from typing import Optional, Union, List, Dict, Any, Tuple
 
@@ -22,9 +21,10 @@ from agents.substituicao import list_subs_agent
 from retrieval.hybrid_retrieval import (
     hybrid_product_retrieval,
     load_processed_data,
-    display_final_results,
 )
 from utils.format_result import format_results_as_json
+from utils.presenter import CliPresenter, get_presenter, set_presenter
+from utils.tracing import span
 
 console = Console()
 
@@ -74,7 +74,7 @@ async def retrieve_products(
 ) -> Dict[str, Any]:
     results = await hybrid_product_retrieval(combined_list, df_with_embeddings, category_embeddings)
     console.print("\n[bold]Resultados para sua lista de compras:[/]")
-    display_final_results(results)
+    get_presenter().final_results(results)
     return results
 
 # ==================== ETAPA 5: PROCESSAMENTO DE SUBSTITUIÇÕES ====================
@@ -98,9 +98,10 @@ async def process_substitutions(
         if substitution_items:
             console.print(f"[green]Substituições sugeridas:[/] {', '.join(substitution_items)}")
             substitution_list = GroceryList(items=[GroceryItem(name=item) for item in substitution_items])
-            substitution_results = await hybrid_product_retrieval(substitution_list, df_with_embeddings, category_embeddings)
+            with span("substitution_retrieval", items=len(substitution_items)):
+                substitution_results = await hybrid_product_retrieval(substitution_list, df_with_embeddings, category_embeddings)
             console.print("\n[bold]Resultados para substituições:[/]")
-            display_final_results(substitution_results)
+            get_presenter().final_results(substitution_results)
             substitution_results, _ = format_results_as_json(substitution_results)
             return {"substituition": substitution_results}, substitution_items
         else:
@@ -149,12 +150,13 @@ def generate_final_response(
                 }
             )
         structured_response["recommendation"] = recommendation_data
-    console.print("\n[bold]Resultados Finais:[/]")
-    console.print(json.dumps(structured_response, indent=2, ensure_ascii=False))
+    get_presenter().final_response(structured_response)
     return structured_response
 
 # ==================== FUNÇÃO PRINCIPAL ====================
 async def main():
+    # Interactive session: render the retrieval progress and results on the terminal
+    set_presenter(CliPresenter(console))
     console.print("[bold blue]Inicializando o sistema de busca híbrida...[/]")
     df_with_embeddings, category_embeddings = load_processed_data()
     if df_with_embeddings is None or category_embeddings is None:
@@ -1,11 +1,13 @@
 from retrieval.hybrid_retrieval import (
     hybrid_product_retrieval,
-    display_final_results,
+    stream_product_retrieval,
     load_processed_data
 )
+from utils.presenter import display_final_results
 
 __all__ = [
     'hybrid_product_retrieval',
+    'stream_product_retrieval',
     'display_final_results',
     'load_processed_data'
 ] 
\ No newline at end of file
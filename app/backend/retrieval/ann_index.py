@@ -0,0 +1,140 @@
+import os
+
+import numpy as np
+
+from retrieval.product_index import normalize_rows
+
+# Rows scored per matrix product while training/assigning, to bound memory
+CHUNK_ROWS = 8192
+
+
+def _assign(matrix, centroids):
+    """Index of the most similar centroid for every row of a normalized matrix."""
+    labels = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), CHUNK_ROWS):
+        labels[start:start + CHUNK_ROWS] = np.argmax(matrix[start:start + CHUNK_ROWS] @ centroids.T, axis=1)
+    return labels
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index over normalized product vectors.
+
+    Products are clustered with spherical k-means; a query only looks at the rows of
+    the `nprobe` clusters whose centroids are most similar to it. The index returns
+    candidate row positions, which are then ranked exactly with the ProductIndex.
+    """
+
+    def __init__(self, centroids, list_offsets, list_rows, nprobe=8, catalog_version=None):
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.nprobe = nprobe
+        # Catalog version the index was built for (None when unknown)
+        self.catalog_version = catalog_version
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, n_iter=10, sample_size=100_000, nprobe=8, seed=0):
+        """
+        Train the coarse quantizer and assign every row to a list.
+
+        Args:
+            matrix (np.ndarray): L2-normalized (N, D) product matrix
+            n_lists (int): Number of clusters, defaults to sqrt(N)
+            n_iter (int): k-means iterations
+            sample_size (int): Maximum number of rows used to train the centroids
+            nprobe (int): Default number of lists searched per query
+            seed (int): Random seed, so rebuilding the same catalog gives the same index
+        """
+        rng = np.random.default_rng(seed)
+        n_rows = len(matrix)
+        n_lists = min(n_rows, n_lists or max(1, int(np.sqrt(n_rows))))
+
+        sample = matrix[np.sort(rng.choice(n_rows, min(n_rows, sample_size), replace=False))]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].astype(np.float32)
+
+        for _ in range(n_iter):
+            labels = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=n_lists)
+
+            # Re-seed empty clusters with random sample rows
+            empty = np.flatnonzero(counts == 0)
+            sums[empty] = sample[rng.choice(len(sample), len(empty))]
+            centroids = normalize_rows(sums)
+
+        labels = _assign(matrix, centroids)
+        list_rows = np.argsort(labels, kind='stable')
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_lists))])
+
+        return cls(centroids, list_offsets, list_rows, nprobe)
+
+    def __len__(self):
+        return len(self.list_rows)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    def candidates(self, query, nprobe=None):
+        """Return the sorted row positions in the `nprobe` lists closest to the query."""
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        scores = self.centroids @ np.asarray(query, dtype=np.float32)
+        probed = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        rows = [self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in probed]
+        return np.sort(np.concatenate(rows))
+
+    def save(self, path, catalog_version=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(
+            path,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_rows=self.list_rows,
+            nprobe=np.array(self.nprobe),
+            catalog_version=np.array(catalog_version or self.catalog_version or ""),
+        )
+
+    @classmethod
+    def load(cls, path, nprobe=None):
+        with np.load(path) as data:
+            return cls(
+                data['centroids'],
+                data['list_offsets'],
+                data['list_rows'],
+                nprobe or int(data['nprobe']),
+                # Indexes saved before versions were recorded have no catalog_version
+                str(data['catalog_version']) or None if 'catalog_version' in data.files else None,
+            )
+
+def recall_at_k(ann_index, product_index, queries, k=10, nprobe=None):
+    """
+    Measure the ANN index against exact search.
+
+    Returns:
+        dict: Mean recall@k of the approximate top-k and the mean fraction of the
+        catalog scored per query
+    """
+    queries = normalize_rows(np.atleast_2d(queries))
+    k = min(k, len(product_index))
+    recalls = []
+    scanned = []
+
+    for query in queries:
+        exact_scores = product_index.similarities(query)
+        exact = np.argpartition(-exact_scores, k - 1)[:k]
+
+        rows = ann_index.candidates(query, nprobe)
+        approx_scores = product_index.similarities(query, rows)
+        approx = rows[np.argsort(-approx_scores)[:k]]
+
+        recalls.append(len(np.intersect1d(exact, approx)) / k)
+        scanned.append(len(rows) / len(product_index))
+
+    return {
+        "nprobe": nprobe or ann_index.nprobe,
+        "recall": float(np.mean(recalls)),
+        "scanned": float(np.mean(scanned)),
+    }
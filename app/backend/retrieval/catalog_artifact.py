@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from retrieval.ann_index import IVFIndex
+from retrieval.indexes import catalog_fingerprint
+from retrieval.product_index import ProductIndex
+from utils.embedding_cache import EMBEDDING_MODEL
+
+# Bump when the layout of the files below changes
+FORMAT_VERSION = 1
+
+DEFAULT_CATALOG_DIR = 'data/catalog'
+
+# Name of the file, in the catalog directory, holding the name of the current version
+CURRENT_FILE = 'CURRENT'
+
+# Versions kept on disk (the current one included), so readers of the previous one keep working
+KEEP_VERSIONS = 2
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _save_strings(directory, name, values):
+    """
+    Store a string column as one UTF-8 blob plus an int64 offsets array (Arrow-style).
+
+    Returns the list of files written. Nulls are kept in a separate boolean mask.
+    """
+    values = pd.Series(values, dtype=object)
+    nulls = values.isna().to_numpy()
+    encoded = [b'' if null else str(value).encode('utf-8') for value, null in zip(values, nulls)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+
+    files = [f"{name}.utf8", f"{name}.offsets.npy"]
+    with open(os.path.join(directory, files[0]), 'wb') as f:
+        f.write(b''.join(encoded))
+    np.save(os.path.join(directory, files[1]), offsets)
+    if nulls.any():
+        files.append(f"{name}.nulls.npy")
+        np.save(os.path.join(directory, files[2]), nulls)
+    return files
+
+def _load_strings(directory, name):
+    offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"))
+    with open(os.path.join(directory, f"{name}.utf8"), 'rb') as f:
+        blob = f.read()
+    values = [blob[start:end].decode('utf-8') for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+    nulls_path = os.path.join(directory, f"{name}.nulls.npy")
+    if os.path.exists(nulls_path):
+        for position in np.flatnonzero(np.load(nulls_path)):
+            values[position] = None
+    return values
+
+def _save_column(directory, name, values):
+    """Store one column, as a plain .npy array when numeric, as strings otherwise."""
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        np.save(os.path.join(directory, f"{name}.npy"), np.asarray(values))
+        return "numeric", [f"{name}.npy"]
+    return "string", _save_strings(directory, name, values)
+
+def _load_column(directory, name, kind):
+    if kind == "numeric":
+        return np.load(os.path.join(directory, f"{name}.npy"))
+    return _load_strings(directory, name)
+
+def current_version(directory=DEFAULT_CATALOG_DIR):
+    """Return the name of the current catalog version in `directory`, or None."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def write_catalog_artifact(df, category_embeddings, directory=DEFAULT_CATALOG_DIR, embedding_column='embedding',
+                           embedding_model=EMBEDDING_MODEL, ann_index=None):
+    """
+    Write the processed catalog as a versioned, memory-mappable artifact.
+
+    Layout of `directory/<version>/`:
+        embeddings.npy: (N, D) float32 product matrix, rows L2-normalized
+        category_embeddings.npy: (C, D) float32 category matrix, plus the category names
+        one file (or blob + offsets) per metadata column, and the DataFrame index
+        ann_index.npz: the IVF index of this version's vectors, when `ann_index` is given
+        manifest.json: format, catalog version, shapes, columns and sha256 of every file
+
+    The version directory is completed first and `directory/CURRENT` is then replaced
+    atomically, so readers always see either the previous or the new version.
+
+    Returns:
+        str: Path of the version directory
+    """
+    version = catalog_fingerprint(df)
+    os.makedirs(directory, exist_ok=True)
+    staging = os.path.join(directory, f".{version}.tmp-{os.getpid()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    files = []
+
+    product_matrix = ProductIndex.from_dataframe(df, embedding_column).matrix
+    np.save(os.path.join(staging, 'embeddings.npy'), product_matrix)
+    files.append('embeddings.npy')
+
+    category_names = list(category_embeddings)
+    category_matrix = np.array([np.asarray(category_embeddings[name], dtype=np.float32) for name in category_names],
+                               dtype=np.float32)
+    np.save(os.path.join(staging, 'category_embeddings.npy'), category_matrix)
+    files.append('category_embeddings.npy')
+    files.extend(_save_strings(staging, 'category_names', category_names))
+
+    index_kind, index_files = _save_column(staging, '_index', df.index.to_series())
+    files.extend(index_files)
+
+    if ann_index is not None:
+        # Published with the vectors it was built on, so it can never outlive them
+        ann_index.save(os.path.join(staging, 'ann_index.npz'), catalog_version=version)
+        files.append('ann_index.npz')
+
+    columns = {}
+    for column in df.columns:
+        if column == embedding_column:
+            continue
+        kind, column_files = _save_column(staging, f"col.{column}", df[column])
+        columns[column] = kind
+        files.extend(column_files)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "catalog_version": version,
+        "embedding_model": embedding_model,
+        "created_at": time.time(),
+        "rows": len(df),
+        "dim": int(product_matrix.shape[1]) if product_matrix.ndim == 2 else 0,
+        "categories": len(category_names),
+        "index": {"kind": index_kind, "name": df.index.name},
+        "columns": columns,
+        "files": {
+            name: {
+                "bytes": os.path.getsize(os.path.join(staging, name)),
+                "sha256": file_checksum(os.path.join(staging, name)),
+            }
+            for name in files
+        },
+    }
+    with open(os.path.join(staging, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    # Move the finished version in place, then point CURRENT at it
+    target = os.path.join(directory, version)
+    if os.path.exists(target):
+        retired = f"{staging}.old"
+        os.replace(target, retired)
+        os.replace(staging, target)
+        shutil.rmtree(retired, ignore_errors=True)
+    else:
+        os.replace(staging, target)
+
+    pointer = os.path.join(directory, f".{CURRENT_FILE}.tmp-{os.getpid()}")
+    with open(pointer, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(directory, CURRENT_FILE))
+
+    _prune_versions(directory, keep=version)
+    return target
+
+def _prune_versions(directory, keep):
+    """Remove the oldest versions beyond KEEP_VERSIONS (never `keep`)."""
+    versions = [
+        entry for entry in os.scandir(directory)
+        if entry.is_dir() and not entry.name.startswith('.') and entry.name != keep
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+class CatalogArtifact:
+    """
+    One opened version of the catalog artifact.
+
+    Opening only reads the manifest. The product and category matrices are
+    memory-mapped on first access, so the OS pages vectors in as queries touch them
+    and every process opening the same version shares one copy.
+    """
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self._embeddings = None
+        self._category_matrix = None
+
+    @classmethod
+    def open(cls, directory=DEFAULT_CATALOG_DIR, version=None, verify=False):
+        """
+        Open a version (the current one by default) of the artifact in `directory`.
+
+        Returns None when there is no artifact. Raises ValueError when the files do not
+        match the manifest (sizes are always checked, checksums only with `verify`).
+        """
+        version = version or current_version(directory)
+        if version is None:
+            return None
+
+        path = os.path.join(directory, version)
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported catalog artifact format {manifest.get('format_version')} in {path}")
+
+        artifact = cls(path, manifest)
+        artifact.verify(checksums=verify)
+        return artifact
+
+    def verify(self, checksums=True):
+        """Check every file against the manifest."""
+        for name, expected in self.manifest["files"].items():
+            file_path = os.path.join(self.path, name)
+            if not os.path.exists(file_path) or os.path.getsize(file_path) != expected["bytes"]:
+                raise ValueError(f"Catalog artifact file {file_path} is missing or truncated")
+            if checksums and file_checksum(file_path) != expected["sha256"]:
+                raise ValueError(f"Catalog artifact file {file_path} does not match its checksum")
+
+    @property
+    def version(self):
+        return self.manifest["catalog_version"]
+
+    @property
+    def embedding_model(self):
+        return self.manifest.get("embedding_model")
+
+    def __len__(self):
+        return self.manifest["rows"]
+
+    @property
+    def embeddings(self):
+        """Memory-mapped (N, D) float32 matrix of L2-normalized product vectors."""
+        if self._embeddings is None:
+            self._embeddings = np.load(os.path.join(self.path, 'embeddings.npy'), mmap_mode='r')
+        return self._embeddings
+
+    @property
+    def category_matrix(self):
+        if self._category_matrix is None:
+            self._category_matrix = np.load(os.path.join(self.path, 'category_embeddings.npy'), mmap_mode='r')
+        return self._category_matrix
+
+    def category_embeddings(self):
+        """Dictionary mapping each category to its embedding (rows of the mapped matrix)."""
+        names = _load_strings(self.path, 'category_names')
+        matrix = self.category_matrix
+        return {name: matrix[i] for i, name in enumerate(names)}
+
+    def dataframe(self, columns=None):
+        """Product metadata as a DataFrame (no embedding column), indexed like the source DataFrame."""
+        if columns is None:
+            columns = list(self.manifest["columns"])
+        index_info = self.manifest["index"]
+        index = pd.Index(_load_column(self.path, '_index', index_info["kind"]), name=index_info["name"])
+        data = {
+            column: _load_column(self.path, f"col.{column}", self.manifest["columns"][column])
+            for column in columns
+        }
+        return pd.DataFrame(data, index=index, columns=columns)
+
+    def ann_index(self, nprobe=None):
+        """The IVFIndex stored with this version, or None if it was written without one."""
+        if 'ann_index.npz' not in self.manifest["files"]:
+            return None
+        return IVFIndex.load(os.path.join(self.path, 'ann_index.npz'), nprobe=nprobe)
+
+    def product_index(self, df=None):
+        """ProductIndex over the mapped matrix (no copy: rows are already normalized)."""
+        row_ids = df.index if df is not None else self.dataframe(columns=[]).index
+        return ProductIndex(self.embeddings, row_ids, normalized=True)
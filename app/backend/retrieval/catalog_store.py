@@ -0,0 +1,216 @@
+import os
+import pickle
+import threading
+import time
+
+from rich.console import Console
+
+from retrieval.ann_index import IVFIndex
+from retrieval.catalog_artifact import CURRENT_FILE, DEFAULT_CATALOG_DIR, CatalogArtifact, current_version, write_catalog_artifact
+from retrieval.indexes import CatalogIndexes
+
+console = Console()
+
+
+class CatalogSnapshot:
+    """
+    One loaded catalog: product metadata, category embeddings and the indexes built on them.
+
+    A snapshot is never modified after it is built. A request takes one snapshot and
+    uses it from start to end, even if a newer catalog is swapped in meanwhile.
+    """
+
+    def __init__(self, df, category_embeddings, indexes, source=None):
+        self.df = df
+        self.category_embeddings = category_embeddings
+        self.indexes = indexes
+        self.source = source
+        self.loaded_at = time.time()
+
+    @property
+    def version(self):
+        return self.indexes.version
+
+def load_snapshot(df_path='data/processed_df.pkl', cat_path='data/category_embeddings.pkl',
+                  ann_path='data/ann_index.npz', catalog_dir=DEFAULT_CATALOG_DIR):
+    """
+    Load the processed catalog from its memory-mapped artifact.
+
+    The embedding matrices are memory-mapped and the metadata columns decoded into a
+    DataFrame; the category, keyword and market indexes are built on first use.
+
+    When there is no artifact yet but the pickled DataFrame and category embeddings
+    exist, they are converted to an artifact first.
+
+    Returns:
+        CatalogSnapshot: The loaded catalog, or None if there is no processed data
+    """
+    verify = os.getenv("CATALOG_VERIFY_CHECKSUMS", "").lower() in ("1", "true", "yes")
+    try:
+        artifact = CatalogArtifact.open(catalog_dir, verify=verify)
+    except (OSError, ValueError) as e:
+        console.print(f"[yellow]Could not open the catalog artifact ({e}), falling back to the pickles[/]")
+        artifact = None
+
+    if artifact is None:
+        # Check if files exist
+        if not os.path.exists(df_path) or not os.path.exists(cat_path):
+            console.print("[bold red]Error: Preprocessed data files not found![/]")
+            console.print("[yellow]Please run preprocess_data.py first to generate the required data files.[/]")
+            return None
+
+        # Convert the pickled DataFrame and category embeddings
+        with open(df_path, 'rb') as f:
+            df = pickle.load(f)
+        with open(cat_path, 'rb') as f:
+            category_embeddings = pickle.load(f)
+        console.print(f"[yellow]Converting {df_path} to a catalog artifact in {catalog_dir}[/]")
+        write_catalog_artifact(df, category_embeddings, catalog_dir)
+        artifact = CatalogArtifact.open(catalog_dir)
+
+    # The metadata columns are decoded here; the embedding matrices are memory-mapped
+    df = artifact.dataframe()
+    category_embeddings = artifact.category_embeddings()
+
+    console.print(f"[green]Loaded {len(df)} products and {len(category_embeddings)} categories "
+                  f"(catalog version {artifact.version})[/]")
+
+    # The ANN index is optional; without it the full-catalog fallback is exact
+    nprobe = int(os.getenv("ANN_NPROBE", 0)) or None
+    ann_index = artifact.ann_index(nprobe=nprobe)
+    if ann_index is None and ann_path and os.path.exists(ann_path):
+        # A separate index file is only used if it was built for this very catalog version
+        ann_index = IVFIndex.load(ann_path, nprobe=nprobe)
+        if ann_index.catalog_version != artifact.version:
+            console.print("[yellow]ANN index does not match the catalog version, ignoring it[/]")
+            ann_index = None
+
+    # Shared by every query of this snapshot; the derived indexes are built on first use
+    indexes = CatalogIndexes(
+        df,
+        category_embeddings,
+        product_index=artifact.product_index(df),
+        ann_index=ann_index,
+        version=artifact.version,
+    )
+    return CatalogSnapshot(df, category_embeddings, indexes, source=artifact.path)
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except (OSError, TypeError):
+        return None
+
+class CatalogStore:
+    """
+    Owner of the process-wide catalog snapshot, with hot reload.
+
+    A background thread polls the data files (the artifact's CURRENT version, the
+    ANN index and the pickles) every `poll_interval` seconds. When they change it
+    loads a new snapshot off the request path and swaps it in with a single
+    reference assignment; requests in flight keep the snapshot they started with.
+    """
+
+    def __init__(self, df_path='data/processed_df.pkl', cat_path='data/category_embeddings.pkl',
+                 ann_path='data/ann_index.npz', catalog_dir=DEFAULT_CATALOG_DIR, poll_interval=30.0):
+        self.df_path = df_path
+        self.cat_path = cat_path
+        self.ann_path = ann_path
+        self.catalog_dir = catalog_dir
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.failures = 0
+        self._snapshot = None
+        self._loaded_state = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _source_state(self):
+        """What the watcher compares between polls to detect a new catalog."""
+        return (
+            current_version(self.catalog_dir),
+            _mtime(os.path.join(self.catalog_dir, CURRENT_FILE)),
+            _mtime(self.ann_path),
+            _mtime(self.df_path),
+            _mtime(self.cat_path),
+        )
+
+    def current(self):
+        """Return the current snapshot, loading it on first use (None if there is no data)."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.refresh()
+            snapshot = self._snapshot
+        return snapshot
+
+    def refresh(self, force=False):
+        """
+        Load a new snapshot if the data files changed since the last load.
+
+        Returns True when a new snapshot was swapped in. A failed load keeps serving
+        the previous snapshot.
+        """
+        with self._load_lock:
+            state = self._source_state()
+            if not force and self._snapshot is not None and state == self._loaded_state:
+                return False
+
+            try:
+                snapshot = load_snapshot(self.df_path, self.cat_path, self.ann_path, self.catalog_dir)
+            except Exception as e:
+                self.failures += 1
+                console.print(f"[red]Error reloading the catalog: {str(e)}[/]")
+                return False
+
+            # Loading may convert the pickles, which changes the state; record it after the load
+            self._loaded_state = self._source_state()
+            if snapshot is None:
+                return False
+
+            self._snapshot = snapshot
+            self.reloads += 1
+            return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            if self.refresh():
+                console.print(f"[green]Catalog reloaded (version {self._snapshot.version})[/]")
+
+    def start(self):
+        """Load the catalog (if not loaded yet) and start watching the data files."""
+        self.current()
+        if self._thread is None and self.poll_interval:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="catalog-store", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "products": len(snapshot.df) if snapshot else 0,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "reloads": self.reloads,
+            "failures": self.failures,
+        }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_catalog_store():
+    """Return the process-wide catalog store, configured from the environment."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CatalogStore(
+                catalog_dir=os.getenv("CATALOG_DIR", DEFAULT_CATALOG_DIR),
+                poll_interval=float(os.getenv("CATALOG_POLL_SECONDS", 30)),
+            )
+        return _store
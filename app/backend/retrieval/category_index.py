@@ -0,0 +1,40 @@
+from collections import defaultdict
+
+import numpy as np
+
+EMPTY_ROWS = np.array([], dtype=np.int64)
+
+
+class CategoryIndex:
+    """
+    Category -> sorted row positions, parsed once from the pipe-joined `categoria` column.
+
+    Lookups match whole category names, so "Leite" no longer selects products that
+    are only in "Leite condensado", and the rows of several categories are combined
+    with a vectorized union instead of a per-product substring scan.
+    """
+
+    def __init__(self, category_strings, separator='|'):
+        postings = defaultdict(list)
+        for position, category_str in enumerate(category_strings):
+            for category in set(str(category_str).split(separator)):
+                postings[category].append(position)
+
+        self.postings = {cat: np.array(rows, dtype=np.int64) for cat, rows in postings.items()}
+        self.size = len(category_strings)
+
+    @classmethod
+    def from_dataframe(cls, df, column='categoria'):
+        return cls(df[column].tolist())
+
+    def __len__(self):
+        return self.size
+
+    def rows(self, categories):
+        """Return the sorted row positions of products in any of the given categories."""
+        lists = [self.postings[cat] for cat in categories if cat in self.postings]
+        if not lists:
+            return EMPTY_ROWS
+        if len(lists) == 1:
+            return lists[0]
+        return np.unique(np.concatenate(lists))
@@ -0,0 +1,69 @@
+import numpy as np
+
+from retrieval.product_index import embedding_to_array, normalize_rows
+
+
+class CategoryMatcher:
+    """
+    Matches suggested categories against every catalog category at once.
+
+    All catalog category embeddings live in one L2-normalized matrix, so the
+    similarities between a batch of suggestions and the whole catalog are a single
+    matrix product; both the main and the fallback threshold are applied to that
+    same block.
+    """
+
+    def __init__(self, category_embeddings):
+        self.names = list(category_embeddings.keys())
+        vectors = [embedding_to_array(emb) for emb in category_embeddings.values()]
+        if vectors:
+            self.matrix = normalize_rows(np.array(vectors, dtype=np.float32))
+        else:
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.names)
+
+    def match(self, suggestion_vectors, threshold=0.75, fallback_threshold=0.6):
+        """Return the catalog categories matching one item's suggested category vectors."""
+        return self.match_many([suggestion_vectors], threshold, fallback_threshold)[0]
+
+    def match_many(self, suggestion_groups, threshold=0.75, fallback_threshold=0.6):
+        """
+        Match the suggested categories of many items in one call.
+
+        Args:
+            suggestion_groups: One (S_i, D) array of suggestion vectors per item
+            threshold: Similarity needed for a category to match
+            fallback_threshold: Lower similarity used for items with no match at `threshold`
+
+        Returns:
+            One list of matched category names per item, in catalog order
+        """
+        groups = [np.atleast_2d(np.asarray(group, dtype=np.float32)) for group in suggestion_groups]
+        sizes = [len(group) if group.size else 0 for group in groups]
+
+        if len(self.names) == 0 or sum(sizes) == 0:
+            return [[] for _ in groups]
+
+        queries = normalize_rows(np.concatenate([g for g, n in zip(groups, sizes) if n]))
+        similarities = queries @ self.matrix.T
+
+        matches = []
+        start = 0
+        for size in sizes:
+            if size == 0:
+                matches.append([])
+                continue
+
+            # Best similarity of each catalog category to any of this item's suggestions
+            best = similarities[start:start + size].max(axis=0)
+            start += size
+
+            matched = np.flatnonzero(best >= threshold)
+            if len(matched) == 0:
+                matched = np.flatnonzero(best >= fallback_threshold)
+
+            matches.append([self.names[i] for i in matched])
+
+        return matches
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import threading
+import time
+
+from rich.console import Console
+
+from agents.common_models import GroceryItem
+from agents.context_expansion_agent import PROMPT_VERSION, context_expansion_agent
+from retrieval.keyword_index import fold_text
+from utils.cache import LRUCache, SQLiteStore
+
+console = Console()
+
+
+def normalize_item_name(name):
+    """Key under which an item's expanded context is stored ("Pão  Francês" == "pao frances")."""
+    return " ".join(fold_text(name).split())
+
+async def expand_with_agent(item_name):
+    """Run the context expansion agent for one item."""
+    result = await context_expansion_agent.run(item_name)
+    return result.data
+
+class ContextExpansionStore:
+    """
+    Memo of expanded item contexts keyed by normalized item name and prompt version.
+
+    Entries live in an in-memory LRU backed by a SQLite file. Entries older than
+    `ttl` seconds are still served, but trigger a single background refresh, so the
+    agent call stays off the critical path for any item seen before.
+    """
+
+    def __init__(self, expand=expand_with_agent, prompt_version=PROMPT_VERSION, path=None,
+                 ttl=7 * 24 * 3600, max_items=4096):
+        self.expand = expand
+        self.prompt_version = prompt_version
+        self.ttl = ttl
+        self.memory = LRUCache(max_items=max_items)
+        self.disk = SQLiteStore(path, table='context_expansion') if path else None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._pending = {}
+
+    async def _lookup(self, key):
+        entry = self.memory.get(key)
+        if entry is None and self.disk is not None:
+            # SQLite runs in a worker thread, so a busy disk never blocks the event loop
+            stored = await asyncio.to_thread(self.disk.get, self.prompt_version, key)
+            if stored is not None:
+                value, updated_at = stored
+                entry = (GroceryItem.model_validate_json(value), updated_at)
+                self.memory.put(key, entry)
+        return entry
+
+    async def _store(self, key, item_context):
+        updated_at = time.time()
+        self.memory.put(key, (item_context, updated_at))
+        if self.disk is not None:
+            await asyncio.to_thread(
+                self.disk.put, self.prompt_version, key, item_context.model_dump_json().encode('utf-8'), updated_at
+            )
+
+    async def _expand_and_store(self, key, item_name):
+        item_context = await self.expand(item_name)
+        await self._store(key, item_context)
+        return item_context
+
+    def _expand_once(self, key, item_name):
+        """Share a single in-flight expansion between concurrent requests for the same item."""
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._expand_and_store(key, item_name))
+            self._pending[key] = task
+            # The entry goes away when the task finishes, not when one of its waiters does
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return task
+
+    async def get(self, item_name):
+        """Return the expanded context (GroceryItem) for an item, calling the agent only when needed."""
+        key = normalize_item_name(item_name)
+        entry = await self._lookup(key)
+
+        if entry is None:
+            self.misses += 1
+            # shield: one caller being cancelled must not cancel the expansion for the others
+            return await asyncio.shield(self._expand_once(key, item_name))
+
+        item_context, updated_at = entry
+        if time.time() - updated_at > self.ttl:
+            # Serve the stale entry and refresh it in the background
+            self.stale_hits += 1
+            self._expand_once(key, item_name).add_done_callback(self._report_refresh_error)
+        else:
+            self.hits += 1
+        return item_context
+
+    @staticmethod
+    def _report_refresh_error(task):
+        if not task.cancelled() and task.exception() is not None:
+            console.print(f"[red]Background context refresh failed: {task.exception()}[/]")
+
+    def stats(self):
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+        }
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_context_store():
+    """Return the process-wide context expansion store, configured from the environment."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ContextExpansionStore(
+                path=os.getenv("CONTEXT_STORE_PATH", "data/context_store.sqlite") or None,
+                ttl=float(os.getenv("CONTEXT_STORE_TTL_SECONDS", 7 * 24 * 3600)),
+            )
+        return _store
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import os
+import threading
+
+from agents.product_filter_agent import PROMPT_VERSION
+from retrieval.context_store import normalize_item_name
+from utils.cache import LRUCache, SQLiteStore
+
+# Verdicts remembered per item, for different candidate sets
+MAX_VERDICTS_PER_ITEM = 8
+
+
+class FilterVerdictCache:
+    """
+    Product ids kept by earlier product_filter_agent runs.
+
+    Verdicts are keyed by normalized query item, catalog version and filter prompt
+    version, and record the candidate ids that were sent and the ids that were kept.
+    A request whose candidate set is contained in a cached one is answered from it;
+    reprocessing the catalog changes its version, which invalidates every verdict.
+    SQLite reads and writes run in a worker thread, off the event loop.
+    """
+
+    def __init__(self, prompt_version=PROMPT_VERSION, path=None, max_items=4096):
+        self.prompt_version = prompt_version
+        self.memory = LRUCache(max_items=max_items)
+        self.disk = SQLiteStore(path, table='filter_verdicts') if path else None
+        self.hits = 0
+        self.misses = 0
+
+    def _namespace(self, catalog_version):
+        return f"{catalog_version}:{self.prompt_version}"
+
+    async def _verdicts(self, namespace, key):
+        verdicts = self.memory.get((namespace, key))
+        if verdicts is None:
+            verdicts = []
+            if self.disk is not None:
+                stored = await asyncio.to_thread(self.disk.get, namespace, key)
+                if stored is not None:
+                    verdicts = [(frozenset(v["candidates"]), frozenset(v["kept"])) for v in json.loads(stored[0])]
+            self.memory.put((namespace, key), verdicts)
+        return verdicts
+
+    async def lookup(self, item_name, candidate_ids, catalog_version):
+        """Return the kept ids (in candidate order) if a cached verdict covers these candidates, else None."""
+        candidates = frozenset(candidate_ids)
+        verdicts = await self._verdicts(self._namespace(catalog_version), normalize_item_name(item_name))
+        for cached_candidates, kept in verdicts:
+            if candidates <= cached_candidates:
+                self.hits += 1
+                return [product_id for product_id in candidate_ids if product_id in kept]
+
+        self.misses += 1
+        return None
+
+    async def store(self, item_name, candidate_ids, kept_ids, catalog_version):
+        """Remember which of the candidates the filter kept."""
+        namespace = self._namespace(catalog_version)
+        key = normalize_item_name(item_name)
+        candidates = frozenset(candidate_ids)
+
+        # A verdict over a superset makes verdicts over its subsets redundant
+        verdicts = [v for v in await self._verdicts(namespace, key) if not v[0] <= candidates]
+        verdicts = ([(candidates, frozenset(kept_ids))] + verdicts)[:MAX_VERDICTS_PER_ITEM]
+        self.memory.put((namespace, key), verdicts)
+
+        if self.disk is not None:
+            payload = [{"candidates": sorted(c), "kept": sorted(k)} for c, k in verdicts]
+            await asyncio.to_thread(self.disk.put, namespace, key, json.dumps(payload).encode('utf-8'))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_filter_cache():
+    """Return the process-wide filter verdict cache, configured from the environment."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FilterVerdictCache(path=os.getenv("FILTER_CACHE_PATH", "data/filter_cache.sqlite") or None)
+        return _cache
@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+
+# Weights of each piece of evidence in the confidence score (they sum to 1)
+TOP_WEIGHT = 0.4
+GAP_WEIGHT = 0.3
+KEYWORD_WEIGHT = 0.3
+
+# Top similarity mapped to 0 and 1 (same range as calculate_adaptive_threshold)
+TOP_FLOOR = 0.3
+TOP_CEILING = 0.7
+
+# Gap between the returned matches and the rest of the candidates that counts as "clear"
+CLEAR_GAP = 0.15
+
+
+def _clip(value):
+    return max(0.0, min(1.0, value))
+
+def filter_confidence(signals):
+    """
+    Confidence (0 to 1) that the ranked matches are already on target.
+
+    Combines how similar the best candidate is, how clearly the returned matches
+    stand out from the candidates that were cut, and whether the matches come from
+    a keyword hit on the item name or its synonyms.
+    """
+    if signals is None or signals.candidate_count == 0:
+        return 0.0
+
+    top = _clip((signals.top_similarity - TOP_FLOOR) / (TOP_CEILING - TOP_FLOOR))
+
+    # Without a tail every candidate was returned, so nothing was separated out
+    if signals.tail_similarity is None:
+        gap = 0.0
+    else:
+        gap = _clip((signals.cutoff_similarity - signals.tail_similarity) / CLEAR_GAP)
+
+    keyword = 1.0 if signals.keyword_hits > 0 else 0.0
+
+    return TOP_WEIGHT * top + GAP_WEIGHT * gap + KEYWORD_WEIGHT * keyword
+
+class FilterGate:
+    """
+    Decides per item whether the LLM product filter can be skipped.
+
+    Items whose ranking confidence reaches `skip_confidence` keep their ranked
+    matches as they are. When `record_path` is set, every LLM decision is appended
+    to a JSONL file together with the signals, for offline agreement reports.
+    """
+
+    def __init__(self, skip_confidence=0.9, record_path=None):
+        self.skip_confidence = skip_confidence
+        self.record_path = record_path
+        self.evaluated = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def should_skip(self, item_matches):
+        """Return (skip, confidence) for an item's ranked matches."""
+        confidence = filter_confidence(item_matches.signals)
+        skip = bool(item_matches.matches) and confidence >= self.skip_confidence
+        with self._lock:
+            self.evaluated += 1
+            self.skipped += skip
+        return skip, confidence
+
+    def record(self, item_matches, confidence, kept_ids):
+        """Append one LLM filter decision to the recording file, if recording is enabled."""
+        if not self.record_path or item_matches.signals is None:
+            return
+
+        entry = {
+            "time": time.time(),
+            "query_item": item_matches.query_item,
+            "confidence": confidence,
+            "signals": item_matches.signals.model_dump(),
+            "candidate_ids": [match.product_id for match in item_matches.matches],
+            "kept_ids": list(kept_ids),
+        }
+        with self._lock, open(self.record_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def stats(self):
+        return {
+            "evaluated": self.evaluated,
+            "skipped": self.skipped,
+            "skip_rate": self.skipped / self.evaluated if self.evaluated else 0.0,
+        }
+
+_gate = None
+_gate_lock = threading.Lock()
+
+def get_filter_gate():
+    """Return the process-wide filter gate, configured from the environment."""
+    global _gate
+    with _gate_lock:
+        if _gate is None:
+            _gate = FilterGate(
+                skip_confidence=float(os.getenv("FILTER_SKIP_CONFIDENCE", 0.9)),
+                record_path=os.getenv("FILTER_GATE_RECORD_PATH") or None,
+            )
+        return _gate
+
+def agreement_report(records, thresholds):
+    """
+    Compare the gate with recorded LLM decisions.
+
+    For each threshold, the items the gate would have skipped are those at or above
+    it; skipping agrees with the LLM when the LLM kept every candidate. The kept
+    fraction shows how much the LLM would still have removed from those items.
+    """
+    report = []
+    for threshold in thresholds:
+        skipped = [r for r in records if r["candidate_ids"] and r["confidence"] >= threshold]
+        agree = [r for r in skipped if set(r["candidate_ids"]) <= set(r["kept_ids"])]
+        kept_fraction = [len(set(r["kept_ids"]) & set(r["candidate_ids"])) / len(r["candidate_ids"]) for r in skipped]
+        report.append({
+            "threshold": threshold,
+            "skip_rate": len(skipped) / len(records) if records else 0.0,
+            "agreement": len(agree) / len(skipped) if skipped else None,
+            "kept_fraction": sum(kept_fraction) / len(kept_fraction) if kept_fraction else None,
+        })
+    return report
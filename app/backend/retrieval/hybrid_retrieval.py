@@ -1,39 +1,30 @@
 import json
 import pandas as pd
 import numpy as np
-import pickle
-from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
-from openai import OpenAI
-from sklearn.metrics.pairwise import cosine_similarity
 import asyncio
-import os
 
 from agents.common_models import (
     GroceryItem, GroceryList, ProductMatch, ProductMatches, 
-    RetrievalResults, FilterData
+    RetrievalResults, FilterData, RankingSignals
 )
 from agents.list_correction_agent import list_correction_agent
-from agents.context_expansion_agent import context_expansion_agent
 from agents.product_filter_agent import product_filter_agent
+from retrieval.catalog_artifact import DEFAULT_CATALOG_DIR
+from retrieval.catalog_store import load_snapshot
+from retrieval.context_store import get_context_store
+from retrieval.filter_cache import get_filter_cache
+from retrieval.filter_gate import get_filter_gate
+from retrieval.indexes import get_catalog_indexes, set_catalog_indexes
+from retrieval.product_index import embedding_to_array
+from retrieval.query_plan import QueryPlan, category_query, description_query
+from utils.compute_pool import get_compute_pool
+from utils.embedding_provider import get_embedding_provider
+from utils.presenter import get_presenter
+from utils.tracing import annotate, span
 
-# Initialize Rich console for better output formatting
-console = Console()
-
-def get_embeddings_client():
-    """Initialize and return the OpenAI client for embeddings."""
-    return OpenAI()
-
-def calculate_similarities(embedding, embeddings_list):
-    """Calculate cosine similarities between embedding and a list of embeddings."""
-    # Extract embedding values
-    query_vector = np.array(embedding.embedding).reshape(1, -1)
-    product_vectors = np.array([emb.embedding for emb in embeddings_list])
-    
-    # Calculate similarities
-    similarities = cosine_similarity(query_vector, product_vectors).flatten()
-    return similarities
+def calculate_similarities(embedding, product_index, rows=None):
+    """Calculate cosine similarities between an embedding and the indexed products at `rows`."""
+    return product_index.similarities(embedding_to_array(embedding), rows)
 
 def calculate_adaptive_threshold(similarities, min_threshold=0.3, max_threshold=0.7):
     """Calculate an adaptive threshold based on the distribution of similarities."""
@@ -56,181 +47,330 @@ def calculate_adaptive_threshold(similarities, min_threshold=0.3, max_threshold=
     # Default case
     return min_threshold
 
-async def get_matching_categories(suggested_categories, category_embeddings, threshold=0.75):
+async def get_matching_categories(suggested_categories, category_matcher, threshold=0.75, fallback_threshold=0.6,
+                                  query_plan=None):
     """Find matching categories from the catalog based on suggested categories."""
-    matches = set()
+    if not suggested_categories:
+        return []
     
-    # Get embeddings for suggested categories
-    client = get_embeddings_client()
-    suggested_contexts = [f"categoria: {cat}" for cat in suggested_categories]
-    suggested_embeddings = client.embeddings.create(
-        input=suggested_contexts,
-        model="text-embedding-3-large"
-    ).data
+    # Get embeddings for suggested categories (batched with the other items of the list)
+    if query_plan is None:
+        query_plan = QueryPlan(get_embedding_provider())
+    suggestion_vectors = await query_plan.embed([category_query(cat) for cat in suggested_categories])
     
-    # Compare with all catalog categories
-    for cat_name, cat_embedding in category_embeddings.items():
-        for i, sugg_embedding in enumerate(suggested_embeddings):
-            # Calculate similarity
-            similarity = cosine_similarity(
-                np.array(sugg_embedding.embedding).reshape(1, -1),
-                cat_embedding.reshape(1, -1)
-            )[0][0]
-            
-            if similarity >= threshold:
-                matches.add(cat_name)
-    
-    # If no matches found with high threshold, reduce threshold
-    if len(matches) == 0:
-        for cat_name, cat_embedding in category_embeddings.items():
-            for i, sugg_embedding in enumerate(suggested_embeddings):
-                similarity = cosine_similarity(
-                    np.array(sugg_embedding.embedding).reshape(1, -1),
-                    cat_embedding.reshape(1, -1)
-                )[0][0]
-                
-                if similarity >= 0.6:  # Lower threshold
-                    matches.add(cat_name)
-    
-    return list(matches)
+    # Compare with all catalog categories in a single similarity block
+    return category_matcher.match(suggestion_vectors, threshold, fallback_threshold)
 
-def get_keyword_matches(keywords, df, column='nome_produto'):
-    """Find products containing any of the keywords."""
-    mask = df[column].str.lower().apply(
-        lambda x: any(keyword.lower() in x.lower() for keyword in keywords)
-    )
-    return df[mask]
+def get_keyword_matches(keywords, keyword_index, rows=None):
+    """Find the row positions of products containing any of the keywords (within `rows`, if given)."""
+    return keyword_index.search(keywords, rows)
 
-async def process_item(item, df, category_embeddings, client, item_context, min_results=3, max_results=10):
-    """Process a single grocery item asynchronously."""
-    console.print(f"[bold yellow]Processing item:[/] [bold]{item.name}[/]")
-    
-    # Print expanded context
-    console.print(Panel(
-        f"[bold]Expanded Context:[/]\n"
-        f"[cyan]Synonyms:[/] {', '.join(item_context.data.possible_synonyms or [])}\n"
-        f"[cyan]Categories:[/] {', '.join(item_context.data.possible_categories or [])}\n"
-        f"[cyan]Description:[/] {item_context.data.description}",
-        title=f"Context for {item.name}",
-        expand=False
-    ))
+async def process_item(item, df, indexes, provider, item_context, min_results=3, max_results=10, query_plan=None,
+                       markets=None):
+    """Process a single grocery item asynchronously (only among products of `markets`, if given)."""
+    if query_plan is None:
+        query_plan = QueryPlan(provider)
+    
+    get_presenter().item_context(item.name, item_context)
+    
+    # Ask for every text of the item at once (description and category suggestions), so
+    # they share the list's batched call; the lookups below are then served by the plan
+    description = description_query(item.name, item_context)
+    await query_plan.embed_item(
+        [description] + [category_query(cat) for cat in item_context.possible_categories or []]
+    )
     
     # Step 2: Category-based filtering
-    matched_categories = await get_matching_categories(
-        item_context.data.possible_categories, 
-        category_embeddings
+    with span("category_match", item=item.name, suggested=len(item_context.possible_categories or [])) as stage:
+        matched_categories = await get_matching_categories(
+            item_context.possible_categories, 
+            indexes.category_matcher,
+            query_plan=query_plan
+        )
+        stage.set(matched=len(matched_categories))
+    
+    # Get embedding for the item description
+    item_desc_embedding = (await query_plan.embed([description]))[0]
+    
+    # Steps 3 to 6 are CPU-bound: run them in the compute pool, off the event loop
+    return await get_compute_pool().run(
+        rank_item, item, df, indexes, item_context, matched_categories, item_desc_embedding,
+        min_results, max_results, markets
     )
+
+def rank_item(item, df, indexes, item_context, matched_categories, item_desc_embedding,
+              min_results=3, max_results=10, markets=None):
+    """Filter, score and select the catalog products for one item (CPU-bound, safe to run in a thread)."""
+    presenter = get_presenter()
     
     # Filter products by matching categories
     if matched_categories:
-        category_filtered_df = df[df['categoria'].apply(
-            lambda x: any(cat in x for cat in matched_categories)
-        )]
-        console.print(f"[green]Found {len(category_filtered_df)} products in {len(matched_categories)} matching categories[/]")
+        category_rows = indexes.category_index.rows(matched_categories)
+        if markets:
+            category_rows = indexes.market_index.restrict(category_rows, markets)
+    elif markets:
+        # If no category matches, use all products of the selected markets
+        category_rows = indexes.market_index.rows(markets)
     else:
         # If no category matches, use all products
-        category_filtered_df = df
-        console.print("[yellow]No matching categories found, using all products[/]")
+        category_rows = np.arange(len(df))
+    presenter.candidate_rows(item.name, len(category_rows), matched_categories, markets)
     
     # Step 3: Keyword-based pre-filtering
     # Include the original item and synonyms
-    keywords = [item.name] + (item_context.data.possible_synonyms or [])
-    keyword_matches = get_keyword_matches(keywords, category_filtered_df)
-    
-    if len(keyword_matches) > 0:
-        console.print(f"[green]Found {len(keyword_matches)} products matching keywords[/]")
-    else:
-        console.print("[yellow]No keyword matches found[/]")
+    keywords = [item.name] + (item_context.possible_synonyms or [])
+    with span("keyword_prefilter", item=item.name, candidates=len(category_rows)) as stage:
+        keyword_rows = get_keyword_matches(keywords, indexes.keyword_index, category_rows)
+        stage.set(matches=len(keyword_rows))
+    presenter.keyword_rows(item.name, len(keyword_rows))
     
     # Step 4 & 5: Similarity ranking on the reduced dataset
-    candidates = keyword_matches if len(keyword_matches) > 0 else category_filtered_df
-    
-    if len(candidates) > 0:
-        # Get embedding for the item description
-        item_desc_embedding = client.embeddings.create(
-            input=[item_context.data.description or item.name],
-            model="text-embedding-3-large"
-        ).data[0]
-        
-        # Calculate similarities
-        similarities = calculate_similarities(item_desc_embedding, candidates['embedding'])
-        candidates = candidates.copy()
-        candidates['similarity'] = similarities
+    if len(keyword_rows) > 0:
+        candidate_rows = keyword_rows
+    elif matched_categories or markets or indexes.ann_index is None:
+        candidate_rows = category_rows
+    else:
+        # Nothing narrowed the search: probe the ANN index instead of scoring the whole catalog
+        candidate_rows = indexes.ann_index.candidates(item_desc_embedding)
+        presenter.approximate_search(item.name, len(candidate_rows))
+    
+    if len(candidate_rows) > 0:
+        with span("similarity_ranking", item=item.name, candidates=len(candidate_rows)) as stage:
+            # Calculate similarities against the prebuilt index, only for the candidate rows
+            similarities = calculate_similarities(item_desc_embedding, indexes.product_index, candidate_rows)
+            
+            # Step 6: Apply adaptive threshold based on result distribution
+            threshold = calculate_adaptive_threshold(similarities)
+            presenter.threshold(item.name, threshold)
+            
+            order = np.argsort(-similarities, kind='stable')
+            selected = order[similarities[order] >= threshold]
+            
+            # Ensure minimum results
+            if len(selected) < min_results and len(candidate_rows) >= min_results:
+                selected = order[:min_results]
+            
+            # Limit maximum results
+            selected = selected[:max_results]
+            stage.set(selected=len(selected))
         
-        # Step 6: Apply adaptive threshold based on result distribution
-        threshold = calculate_adaptive_threshold(similarities)
-        console.print(f"[cyan]Adaptive threshold:[/] {threshold:.4f}")
+        final_rows = candidate_rows[selected]
+        final_results = df.iloc[final_rows]
+        final_similarities = similarities[selected]
         
-        final_results = candidates[candidates['similarity'] >= threshold].sort_values(
-            'similarity', ascending=False
+        # Distribution statistics used to decide whether the LLM filter can be skipped
+        tail = similarities[order[len(selected):]]
+        signals = RankingSignals(
+            candidate_count=len(candidate_rows),
+            top_similarity=float(similarities[order[0]]),
+            cutoff_similarity=float(final_similarities[-1]) if len(selected) else float(similarities[order[0]]),
+            tail_similarity=float(tail.mean()) if len(tail) else None,
+            mean_similarity=float(similarities.mean()),
+            std_similarity=float(similarities.std()),
+            threshold=float(threshold),
+            keyword_hits=len(keyword_rows)
         )
-        
-        # Ensure minimum results
-        if len(final_results) < min_results and len(candidates) >= min_results:
-            final_results = candidates.sort_values('similarity', ascending=False).head(min_results)
-        
-        # Limit maximum results
-        final_results = final_results.head(max_results)
     else:
+        final_rows = []
         final_results = pd.DataFrame()
+        final_similarities = []
+        signals = None
     
     # Create ProductMatches object
+    requested = set(markets) if markets else None
     matches = []
-    for _, row in final_results.iterrows():
-        matches.append(ProductMatch(
+    for (_, row), position, similarity in zip(final_results.iterrows(), final_rows, final_similarities):
+        match = ProductMatch(
             product_id=str(row.name),  # Index as string
             name=row['nome_produto'],
             price=row['preco'],
             description=row['descricao'],
             category=row['categoria'],
-            similarity=float(row.get('similarity', 0)),
+            similarity=float(similarity),
             nome_mercado=row['nome_mercado']
-        ))
+        )
+        # Markets come from the market index codes, so grouping never re-splits nome_mercado;
+        # with a market filter, only the requested markets are reported
+        match._markets = indexes.market_index.row_markets(position)
+        if requested is not None:
+            match._markets = [market for market in match._markets if market in requested]
+        matches.append(match)
     
     result = ProductMatches(
         query_item=item.name,
         matches=matches,
-        matched_categories=matched_categories
+        matched_categories=matched_categories,
+        signals=signals
     )
     
-    # Print item results
-    display_item_results(result)
+    presenter.item_results(result)
     
     return result
 
-def display_item_results(item_results):
-    """Display formatted results for a single item."""
-    if not item_results.matches:
-        console.print("[bold red]No matches found![/]")
-        return
-    
-    # Create a table for results
-    table = Table(title=f"Results for {item_results.query_item}")
-    table.add_column("No.", style="dim")
-    table.add_column("Product Name", style="cyan")
-    table.add_column("Price", style="green")
-    table.add_column("Category", style="yellow")
-    table.add_column("Similarity", style="magenta")
-    
-    # Add rows to the table
-    for i, match in enumerate(item_results.matches):
-        # Extract primary category (first one from the categories string)
-        primary_category = match.category.split('|')[0] if '|' in match.category else match.category
+async def filter_single_item(item_name, item_matches, item_context, indexes):
+    """Remove irrelevant products from an item's ranked matches with the product filter agent."""
+    filter_cache = get_filter_cache()
+    filter_gate = get_filter_gate()
+    presenter = get_presenter()
+    
+    try:
+        # Store original product information for reconstruction
+        original_products = {match.product_id: match for match in item_matches.matches}
+        candidate_ids = list(original_products)
+        
+        # Reuse an earlier verdict for the same item over the same (or a larger) candidate set
+        cached_ids = await filter_cache.lookup(item_name, candidate_ids, indexes.version)
+        if cached_ids is not None:
+            presenter.filter_outcome(item_name, "cached")
+            annotate(outcome="cached")
+            return item_name, [original_products[product_id] for product_id in cached_ids]
         
-        table.add_row(
-            str(i+1),
-            match.name,
-            f"R${match.price:.2f}",
-            primary_category,
-            f"{match.similarity:.2f}"
+        # Skip the LLM round-trip when the ranking is already clearly on target
+        skip_filter, confidence = filter_gate.should_skip(item_matches)
+        if skip_filter:
+            presenter.filter_outcome(item_name, "skipped", confidence=confidence)
+            annotate(outcome="skipped", confidence=confidence)
+            return item_name, item_matches.matches
+        
+        # Convert to serializable format for the agent with only essential fields
+        serializable_data = {
+            "query_item": item_matches.query_item,
+            "matches": [{
+                "product_id": match.product_id,
+                "name": match.name,
+                "description": match.description,
+                "category": match.category,
+            } for match in item_matches.matches],
+            "expanded_context": {
+                item_name: {
+                    "name": item_name,
+                    "possible_synonyms": item_context.possible_synonyms or [],
+                    "possible_categories": item_context.possible_categories or [],
+                    "description": item_context.description or ""
+                }
+            }
+        }
+        
+        # Convert to JSON
+        filter_data_json = json.dumps(serializable_data, ensure_ascii=False)
+        
+        # Debug view of the data sent to the agent (nothing is rendered when headless)
+        presenter.filter_payload(item_name, serializable_data)
+        
+        # Filter products using the agent
+        annotate(outcome="agent", confidence=confidence)
+        filtered_results = await product_filter_agent.run(filter_data_json)
+        
+        if not filtered_results or not filtered_results.data:
+            presenter.filter_outcome(item_name, "no_response")
+            return item_name, item_matches.matches
+        
+        # If agent returns empty list, it means no products matched the criteria
+        if not filtered_results.data.matches:
+            presenter.filter_outcome(item_name, "empty")
+            await filter_cache.store(item_name, candidate_ids, [], indexes.version)
+            filter_gate.record(item_matches, confidence, [])
+            return item_name, []
+        
+        # Reconstruct filtered products with original data
+        reconstructed_matches = []
+        for filtered_match in filtered_results.data.matches:
+            # Get the original product data
+            original_match = original_products.get(filtered_match.product_id)
+            if original_match:
+                # Copy the original match, keeping all original data and its markets
+                reconstructed_matches.append(original_match.model_copy())
+        
+        kept_ids = [match.product_id for match in reconstructed_matches]
+        await filter_cache.store(item_name, candidate_ids, kept_ids, indexes.version)
+        filter_gate.record(item_matches, confidence, kept_ids)
+        return item_name, reconstructed_matches
+    except Exception as e:
+        annotate(outcome="error", error=type(e).__name__)
+        presenter.filter_outcome(item_name, "error", error=str(e))
+        return item_name, item_matches.matches
+
+async def retrieve_item(item, df, indexes, provider, query_plan, min_results=3, max_results=10, markets=None):
+    """Run one item through context expansion, ranking and filtering."""
+    # Root span of the item: the stages below are its children
+    with span("retrieve_item", item=item.name, markets=len(markets or [])):
+        # Step 1: Expand the item's context (served from the context store when seen before)
+        with span("context_expansion", item=item.name):
+            try:
+                item_context = await get_context_store().get(item.name)
+            except BaseException:
+                # This item will never ask for vectors: don't hold the list's batch for it
+                query_plan.skip_item()
+                raise
+        
+        # Step 2: Rank catalog products for the item
+        ranked = await process_item(
+            item, 
+            df, 
+            indexes,
+            provider,
+            item_context,
+            min_results, 
+            max_results,
+            query_plan,
+            markets
+        )
+        
+        # Step 3: Filter irrelevant products
+        with span("llm_filter", item=item.name, candidates=len(ranked.matches)) as stage:
+            _, matches = await filter_single_item(item.name, ranked, item_context, indexes)
+            stage.set(kept=len(matches))
+        
+        return ProductMatches(
+            query_item=item.name,
+            matches=matches,  # matches are already ProductMatch objects
+            matched_categories=ranked.matched_categories
         )
+
+async def stream_product_retrieval(corrected_list, df, category_embeddings, 
+                                   min_results=3, max_results=10, indexes=None, markets=None):
+    """
+    Retrieve products for a shopping list, yielding each item as soon as it is done.
+    
+    Every item goes through expansion, ranking and filtering on its own, so one slow
+    item does not hold the others back. The query texts of all items are still embedded
+    in one batched call by a shared QueryPlan, sent once every item has asked for its
+    texts (or after QueryPlan.max_wait).
     
-    console.print(table)
-    console.print(f"[cyan]Matched categories:[/] {', '.join(item_results.matched_categories)}")
-    console.print()
+    Args:
+        corrected_list (GroceryList): Pre-corrected list of grocery items
+        df (DataFrame): Preprocessed product DataFrame with embeddings
+        category_embeddings (dict): Dictionary mapping categories to embeddings
+        min_results (int): Minimum number of results to return per item
+        max_results (int): Maximum number of results to return per item
+        indexes (CatalogIndexes): Indexes of this catalog (e.g. from a CatalogSnapshot);
+            looked up from df/category_embeddings when omitted
+        markets (list): Only search products sold in these markets (all markets when omitted)
+        
+    Yields:
+        ProductMatches: Final (filtered) matches of one item, in completion order
+    """
+    provider = get_embedding_provider()
+    if indexes is None:
+        indexes = get_catalog_indexes(df, category_embeddings)
+    query_plan = QueryPlan(provider, items=len(corrected_list.items))
+    
+    get_presenter().shopping_list([item.name for item in corrected_list.items])
+    
+    tasks = [
+        asyncio.ensure_future(retrieve_item(item, df, indexes, provider, query_plan, min_results, max_results, markets))
+        for item in corrected_list.items
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The consumer stopped early (or an item failed): don't leave the others running
+        for task in tasks:
+            task.cancel()
 
 async def hybrid_product_retrieval(corrected_list, df, category_embeddings, 
-                                  min_results=3, max_results=10):
+                                  min_results=3, max_results=10, indexes=None, markets=None):
     """
     Hybrid approach to retrieve products based on a shopping list.
     
@@ -240,241 +380,46 @@ async def hybrid_product_retrieval(corrected_list, df, category_embeddings,
         category_embeddings (dict): Dictionary mapping categories to embeddings
         min_results (int): Minimum number of results to return per item
         max_results (int): Maximum number of results to return per item
+        indexes (CatalogIndexes): Indexes of this catalog, looked up when omitted
+        markets (list): Only search products sold in these markets (all markets when omitted)
         
     Returns:
         RetrievalResults: Object containing corrected list and product matches
     """
-    client = get_embeddings_client()
-    
-    # Display corrected list
-    corrected_items = [item.name for item in corrected_list.items]
-    console.print(Panel(
-        "\n".join([f"• {item}" for item in corrected_items]),
-        title="Shopping List",
-        expand=False
-    ))
-
-    print("Iniciando context expansion para todos os itens...")
-    
-    # Step 1: First expand context for all items asynchronously
-    async def expand_item_context(item_name):
-        item_context = await context_expansion_agent.run(item_name)
-        return item_name, item_context
-    
-    # Create tasks for context expansion
-    context_expansion_tasks = [expand_item_context(item.name) for item in corrected_list.items]
-    
-    # Run all context expansion tasks concurrently
-    context_expansion_results = await asyncio.gather(*context_expansion_tasks)
-    
-    # Create a dictionary with the expanded contexts
-    expanded_context = {}
-    for item_name, item_context in context_expansion_results:
-        expanded_context[item_name] = {
-            "name": item_name,
-            "possible_synonyms": item_context.data.possible_synonyms,
-            "possible_categories": item_context.data.possible_categories,
-            "description": item_context.data.description
-        }
-    
-    print("Context expansion concluída. Iniciando processamento de itens...")
-    
-    # Step 2: Process each item using the expanded context
-    tasks = []
-    for item in corrected_list.items:
-        item_context_obj = context_expansion_results[[i for i, (name, _) in enumerate(context_expansion_results) if name == item.name][0]][1]
-        
-        tasks.append(process_item(
-            item, 
-            df, 
-            category_embeddings, 
-            client,
-            item_context_obj,
-            min_results, 
-            max_results
-        ))
-    
-    print("Vai começar o gather para processamento dos itens")
-    # Wait for all tasks to complete
-    results = await asyncio.gather(*tasks)
-    print("Gather finalizado")
-    
-    # Build results dictionary
-    results_dict = {result.query_item: result for result in results}
-    
-    # Step 3: Filter irrelevant products
-    console.print("[bold blue]Filtering irrelevant products...[/]")
-    
-    async def filter_single_item(item_name, item_matches, item_context):
-        try:
-            # Store original product information for reconstruction
-            original_products = {match.product_id: match for match in item_matches.matches}
-            
-            # Convert to serializable format for the agent with only essential fields
-            serializable_data = {
-                "query_item": item_matches.query_item,
-                "matches": [{
-                    "product_id": match.product_id,
-                    "name": match.name,
-                    "description": match.description,
-                    "category": match.category,
-                } for match in item_matches.matches],
-                "expanded_context": {
-                    item_name: {
-                        "name": item_context["name"],
-                        "possible_synonyms": item_context["possible_synonyms"] or [],
-                        "possible_categories": item_context["possible_categories"] or [],
-                        "description": item_context["description"] or ""
-                    }
-                }
-            }
-            
-            # Convert to JSON
-            filter_data_json = json.dumps(serializable_data, ensure_ascii=False)
-            
-            # Debug print the JSON being sent to the agent
-            console.print(Panel(
-                json.dumps(serializable_data, indent=2, ensure_ascii=False),
-                title=f"Data being sent to product_filter_agent for {item_name}",
-                expand=False
-            ))
-            
-            # Filter products using the agent
-            filtered_results = await product_filter_agent.run(filter_data_json)
-            
-            if not filtered_results or not filtered_results.data:
-                console.print(f"[red]Error in filtering for {item_name}, using original matches[/]")
-                return item_name, item_matches.matches
-            
-            # If agent returns empty list, it means no products matched the criteria
-            if not filtered_results.data.matches:
-                console.print(f"[green]No relevant products found for {item_name} after filtering[/]")
-                return item_name, []
-            
-            # Reconstruct filtered products with original data
-            reconstructed_matches = []
-            for filtered_match in filtered_results.data.matches:
-                # Get the original product data
-                original_match = original_products.get(filtered_match.product_id)
-                if original_match:
-                    # Create a new ProductMatch with all original data
-                    reconstructed_matches.append(ProductMatch(
-                        product_id=original_match.product_id,
-                        name=original_match.name,
-                        price=original_match.price,
-                        description=original_match.description,
-                        category=original_match.category,
-                        similarity=original_match.similarity,
-                        nome_mercado=original_match.nome_mercado
-                    ))
-            
-            return item_name, reconstructed_matches
-        except Exception as e:
-            console.print(f"[red]Error filtering {item_name}: {str(e)}[/]")
-            console.print("[yellow]Using original matches as fallback[/]")
-            return item_name, item_matches.matches
-    
-    # Process all items concurrently
-    filter_tasks = []
-    for item_name, item_matches in results_dict.items():
-        filter_tasks.append(filter_single_item(
-            item_name,
-            item_matches,
-            expanded_context[item_name]
-        ))
-    
-    # Wait for all tasks to complete
-    filtered_results = await asyncio.gather(*filter_tasks)
-
-    print("filtered_results")
-    print(filtered_results)
-    
-    # Convert back to the original format
-    final_results = {}
-    for item_name, matches in filtered_results:
-        final_results[item_name] = ProductMatches(
-            query_item=item_name,
-            matches=matches,  # matches are already ProductMatch objects
-            matched_categories=results_dict[item_name].matched_categories
-        )
-    
-    console.print(f"[green]Filtering complete. Processed {len(filtered_results)} items.[/]")
-    
-    # Return the results
-    return RetrievalResults(
+    completed = {}
+    async for item_results in stream_product_retrieval(
+        corrected_list, df, category_embeddings, min_results, max_results, indexes, markets
+    ):
+        completed[item_results.query_item] = item_results
+    
+    # Keep the shopping list order
+    final_results = {
+        item.name: completed[item.name]
+        for item in corrected_list.items
+        if item.name in completed
+    }
+    
+    results = RetrievalResults(
         corrected_list=corrected_list,
         product_matches=final_results
     )
-
-def display_final_results(results):
-    """Display a comprehensive summary of all results."""
-    total_items = len(results.corrected_list.items)
-    total_matches = sum(len(matches.matches) for matches in results.product_matches.values())
-    
-    console.print("\n")
-    console.print(Panel(
-        f"[bold]Total items:[/] {total_items}\n"
-        f"[bold]Total product matches:[/] {total_matches}",
-        title="Summary",
-        expand=False
-    ))
-    
-    # Display all found products grouped by item
-    console.print(Panel("[bold]All Found Products[/]", expand=False))
-    
-    for item in results.corrected_list.items:
-        item_results = results.product_matches.get(item.name)
-        if not item_results or not item_results.matches:
-            console.print(f"[bold yellow]{item.name}:[/] [red]No matches found[/]")
-            console.print()
-            continue
-        
-        console.print(f"[bold yellow]{item.name}[/] ({len(item_results.matches)} products)")
-        
-        # Create a table for item results
-        table = Table(show_header=True, width=100)
-        table.add_column("No.", style="dim", width=4)
-        table.add_column("Product Name", style="cyan")
-        table.add_column("Price", style="green", width=10)
-        table.add_column("Category", style="yellow", width=15)
-        table.add_column("Similarity", style="magenta", width=10)
-        
-        for i, match in enumerate(item_results.matches):
-            # Extract primary category
-            primary_category = match.category.split('|')[0] if '|' in match.category else match.category
-            
-            table.add_row(
-                str(i+1),
-                match.name,
-                f"R${match.price:.2f}",
-                primary_category,
-                f"{match.similarity:.2f}"
-            )
-        
-        console.print(table)
-        console.print(f"[dim]Matched categories: {', '.join(item_results.matched_categories)}[/]")
-        console.print("\n" + "-" * 80 + "\n")  # Divider between items
+    get_presenter().retrieval_done(results)
+    return results
 
 # Data loading functions
-def load_processed_data(df_path='data/processed_df.pkl', cat_path='data/category_embeddings.pkl'):
-    """Load the processed dataframe and category embeddings from disk."""
-    console.print("[bold blue]Loading preprocessed data...[/]")
+def load_processed_data(df_path='data/processed_df.pkl', cat_path='data/category_embeddings.pkl',
+                        ann_path='data/ann_index.npz', catalog_dir=DEFAULT_CATALOG_DIR):
+    """
+    Load the processed catalog from its memory-mapped artifact.
     
-    # Check if files exist
-    if not os.path.exists(df_path) or not os.path.exists(cat_path):
-        console.print("[bold red]Error: Preprocessed data files not found![/]")
-        console.print("[yellow]Please run preprocess_data.py first to generate the required data files.[/]")
+    Long-running services should use the CatalogStore instead, which loads the
+    catalog once and reloads it in the background when the files change.
+    """
+    snapshot = load_snapshot(df_path, cat_path, ann_path, catalog_dir)
+    if snapshot is None:
         return None, None
     
-    # Load dataframe with embeddings
-    with open(df_path, 'rb') as f:
-        df = pickle.load(f)
+    # Queries on this DataFrame reuse the indexes built with the snapshot
+    set_catalog_indexes(snapshot.df, snapshot.category_embeddings, snapshot.indexes)
     
-    # Load category embeddings
-    with open(cat_path, 'rb') as f:
-        category_embeddings = pickle.load(f)
-    
-    console.print(f"[green]Loaded {len(df)} products and {len(category_embeddings)} categories[/]")
-    
-    return df, category_embeddings
-
+    return snapshot.df, snapshot.category_embeddings
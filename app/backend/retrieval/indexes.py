@@ -0,0 +1,87 @@
+import hashlib
+import threading
+
+import pandas as pd
+
+from retrieval.category_index import CategoryIndex
+from retrieval.category_matcher import CategoryMatcher
+from retrieval.keyword_index import KeywordIndex
+from retrieval.market_index import MarketIndex
+from retrieval.product_index import ProductIndex
+
+
+def catalog_fingerprint(df):
+    """Content hash of the product columns, so any change to the processed catalog changes it."""
+    columns = [col for col in ('nome_produto', 'preco', 'descricao', 'categoria', 'nome_mercado') if col in df.columns]
+    hashed = pd.util.hash_pandas_object(df[columns], index=True).to_numpy()
+    return hashlib.sha256(hashed.tobytes()).hexdigest()[:16]
+
+class CatalogIndexes:
+    """
+    Lookup structures derived once from a loaded catalog and shared by every query.
+
+    The category, keyword and market indexes are built on first access rather than
+    when the catalog is opened, so opening (or hot-swapping) a catalog does not pay
+    for indexes until a query needs them. Each one is built at most once, even when
+    several threads ask for it at the same time.
+    """
+
+    def __init__(self, df, category_embeddings, product_index=None, ann_index=None, version=None):
+        self.product_index = product_index if product_index is not None else ProductIndex.from_dataframe(df)
+        self.ann_index = ann_index
+        self.version = version or catalog_fingerprint(df)
+        self._df = df
+        self._category_embeddings = category_embeddings
+        self._built = {}
+        self._build_lock = threading.Lock()
+
+    def _get(self, name, build):
+        index = self._built.get(name)
+        if index is None:
+            with self._build_lock:
+                index = self._built.get(name)
+                if index is None:
+                    index = self._built[name] = build()
+        return index
+
+    @property
+    def category_matcher(self):
+        return self._get('category_matcher', lambda: CategoryMatcher(self._category_embeddings))
+
+    @property
+    def category_index(self):
+        return self._get('category_index', lambda: CategoryIndex.from_dataframe(self._df, 'categoria'))
+
+    @property
+    def keyword_index(self):
+        return self._get('keyword_index', lambda: KeywordIndex.from_dataframe(self._df, 'nome_produto'))
+
+    @property
+    def market_index(self):
+        return self._get('market_index', lambda: MarketIndex.from_dataframe(self._df, 'nome_mercado'))
+
+    def warm(self):
+        """Build every index now (e.g. before timing queries)."""
+        for name in ('category_matcher', 'category_index', 'keyword_index', 'market_index'):
+            getattr(self, name)
+        return self
+
+# The most recently built indexes, keyed by the identity of the objects they were built from.
+# A strong reference to the source objects is kept so their ids cannot be reused.
+_cached = None
+
+def get_catalog_indexes(df, category_embeddings, **prebuilt):
+    """Return the indexes for this catalog, building them only the first time it is seen."""
+    global _cached
+
+    if _cached is not None and _cached[0] is df and _cached[1] is category_embeddings:
+        return _cached[2]
+
+    indexes = CatalogIndexes(df, category_embeddings, **prebuilt)
+    _cached = (df, category_embeddings, indexes)
+    return indexes
+
+def set_catalog_indexes(df, category_embeddings, indexes):
+    """Register indexes built elsewhere so get_catalog_indexes returns them for this catalog."""
+    global _cached
+    _cached = (df, category_embeddings, indexes)
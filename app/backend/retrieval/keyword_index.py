@@ -0,0 +1,92 @@
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+NGRAM = 3
+EMPTY_ROWS = np.array([], dtype=np.int64)
+
+
+def fold_text(text):
+    """Lowercase and strip accents so that "Pão" and "pao" (or "maçã" and "maca") compare equal."""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+def ngrams(text, n=NGRAM):
+    """Return the set of character n-grams of an already folded text."""
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+class KeywordIndex:
+    """
+    Inverted trigram index over a text column of the catalog.
+
+    Texts are accent- and case-folded once at build time. A keyword query intersects
+    the posting lists of the keyword's trigrams and then confirms the substring on
+    the few surviving rows, so it returns exactly the rows whose folded text contains
+    the folded keyword without scanning the catalog.
+    """
+
+    def __init__(self, texts, max_cached_keywords=4096):
+        self.folded = [fold_text(text) for text in texts]
+
+        postings = defaultdict(list)
+        for position, text in enumerate(self.folded):
+            for gram in ngrams(text):
+                postings[gram].append(position)
+        self.postings = {gram: np.array(rows, dtype=np.int64) for gram, rows in postings.items()}
+
+        self._keyword_rows = {}
+        self._max_cached_keywords = max_cached_keywords
+
+    @classmethod
+    def from_dataframe(cls, df, column='nome_produto'):
+        return cls(df[column].tolist())
+
+    def __len__(self):
+        return len(self.folded)
+
+    def search(self, keywords, rows=None):
+        """
+        Return the sorted row positions whose text contains any of the keywords.
+
+        Args:
+            keywords: Keywords to look for (case and accents are ignored)
+            rows: Optional sorted array of row positions the result is restricted to
+        """
+        hits = [self._rows_containing(fold_text(keyword)) for keyword in keywords if keyword and keyword.strip()]
+        hits = [h for h in hits if len(h)]
+        if not hits:
+            return EMPTY_ROWS
+
+        result = hits[0] if len(hits) == 1 else np.unique(np.concatenate(hits))
+        if rows is not None:
+            result = np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def _rows_containing(self, keyword):
+        cached = self._keyword_rows.get(keyword)
+        if cached is not None:
+            return cached
+
+        if len(keyword) < NGRAM:
+            # Too short for trigrams: fall back to a scan over the pre-folded texts
+            result = np.array([i for i, text in enumerate(self.folded) if keyword in text], dtype=np.int64)
+        else:
+            grams = ngrams(keyword)
+            if any(gram not in self.postings for gram in grams):
+                result = EMPTY_ROWS
+            else:
+                # Intersect the rarest posting lists first to keep intermediate results small
+                lists = sorted((self.postings[gram] for gram in grams), key=len)
+                candidates = lists[0]
+                for posting in lists[1:]:
+                    if len(candidates) == 0:
+                        break
+                    candidates = np.intersect1d(candidates, posting, assume_unique=True)
+                # Trigram co-occurrence does not imply adjacency; confirm the substring
+                result = np.array([i for i in candidates if keyword in self.folded[i]], dtype=np.int64)
+
+        if len(self._keyword_rows) >= self._max_cached_keywords:
+            self._keyword_rows.clear()
+        self._keyword_rows[keyword] = result
+        return result
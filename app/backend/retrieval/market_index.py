@@ -0,0 +1,68 @@
+import numpy as np
+
+EMPTY_ROWS = np.array([], dtype=np.int64)
+
+
+class MarketIndex:
+    """
+    Market membership of every product, parsed once from the pipe-joined `nome_mercado` column.
+
+    Each market has a packed bitset over the catalog rows, so restricting a search
+    to a set of markets is an OR of a few bitsets. The markets of each row are also
+    kept as integer codes (CSR layout) for grouping results by market.
+    """
+
+    def __init__(self, market_strings, separator='|'):
+        self.names = []
+        self.codes = {}
+        row_codes = []
+        row_offsets = [0]
+        for market_str in market_strings:
+            for name in dict.fromkeys(str(market_str).split(separator)):
+                code = self.codes.get(name)
+                if code is None:
+                    code = self.codes[name] = len(self.names)
+                    self.names.append(name)
+                row_codes.append(code)
+            row_offsets.append(len(row_codes))
+
+        self.size = len(market_strings)
+        self.row_codes = np.array(row_codes, dtype=np.int32)
+        self.row_offsets = np.array(row_offsets, dtype=np.int64)
+
+        # Set the bits in place (packbits' big-endian bit order) rather than packing a
+        # dense markets x rows boolean matrix, which would take 8x the memory
+        rows = np.repeat(np.arange(self.size), np.diff(self.row_offsets))
+        self.bitsets = np.zeros((len(self.names), (self.size + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(self.bitsets, (self.row_codes, rows >> 3), (0x80 >> (rows & 7)).astype(np.uint8))
+
+    @classmethod
+    def from_dataframe(cls, df, column='nome_mercado'):
+        return cls(df[column].tolist())
+
+    def __len__(self):
+        return self.size
+
+    def mask(self, markets):
+        """Return a boolean row bitmap of products sold in any of the given markets."""
+        codes = [self.codes[name] for name in markets if name in self.codes]
+        if not codes:
+            return np.zeros(self.size, dtype=bool)
+        bits = np.bitwise_or.reduce(self.bitsets[codes], axis=0)
+        return np.unpackbits(bits, count=self.size).astype(bool)
+
+    def rows(self, markets):
+        """Return the sorted row positions of products sold in any of the given markets."""
+        if not markets:
+            return EMPTY_ROWS
+        return np.flatnonzero(self.mask(markets))
+
+    def restrict(self, rows, markets):
+        """Keep the row positions (sorted) of products sold in any of the given markets."""
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows[self.mask(markets)[rows]]
+
+    def row_markets(self, row):
+        """Names of the markets selling the product at a row position."""
+        start, end = self.row_offsets[row], self.row_offsets[row + 1]
+        return [self.names[code] for code in self.row_codes[start:end]]
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+
+def embedding_to_array(embedding):
+    """Return the raw vector of an OpenAI Embedding object or of an array-like."""
+    return getattr(embedding, 'embedding', embedding)
+
+def normalize_rows(matrix):
+    """L2-normalize the rows of a 2D float32 matrix (zero rows are left as zeros)."""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class ProductIndex:
+    """
+    Dense, L2-prenormalized float32 matrix of product embeddings.
+
+    Row ``i`` of the matrix is the product at position ``i`` of the DataFrame the
+    index was built from; ``row_ids`` maps positions back to DataFrame index labels.
+    Because rows are normalized once at build time, cosine similarity against any
+    subset of rows is a single matrix product.
+    """
+
+    def __init__(self, matrix, row_ids, normalized=False):
+        self.matrix = matrix if normalized else normalize_rows(matrix)
+        self.row_ids = pd.Index(row_ids)
+
+    @classmethod
+    def from_dataframe(cls, df, column='embedding'):
+        """Build the index from a DataFrame whose column holds one embedding per product."""
+        matrix = np.array([embedding_to_array(emb) for emb in df[column]], dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(df), -1)
+        return cls(matrix, df.index)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    def similarities(self, queries, rows=None):
+        """
+        Cosine similarities between query vector(s) and the indexed products.
+
+        Args:
+            queries: A single vector (D,) or a batch of vectors (Q, D)
+            rows: Optional array of row positions restricting the candidates
+
+        Returns:
+            Array of shape (N,) for a single query or (Q, N) for a batch, where N is
+            the number of candidate rows
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        queries = normalize_rows(np.atleast_2d(queries))
+
+        candidates = self.matrix if rows is None else self.matrix[np.asarray(rows, dtype=np.intp)]
+        scores = queries @ candidates.T
+
+        return scores[0] if single else scores
@@ -0,0 +1,112 @@
+import asyncio
+
+import numpy as np
+
+from utils.embedding_cache import normalize_text
+
+
+def category_query(category):
+    """Text embedded for a suggested category (matches how catalog categories were embedded)."""
+    return f"categoria: {category}"
+
+def description_query(item_name, item_context):
+    """Text embedded to rank products for an item."""
+    return item_context.description or item_name
+
+class QueryPlan:
+    """
+    Shared query vectors for one shopping list.
+
+    Items of a list run independently and reach the embedding stage whenever their
+    context expansion is done, which for uncached items is seconds apart. When the
+    plan knows how many `items` the list has, the texts they ask for are held until
+    every item has asked (embed_item) or given up (skip_item), or at most `max_wait`
+    seconds, and are then deduplicated and embedded together in one batched call.
+    Without `items`, texts asked for within `window` seconds of each other share a
+    batch. Every vector is kept for the other items of the list.
+    """
+
+    def __init__(self, provider, items=None, window=0.005, max_wait=1.0):
+        self.provider = provider
+        self.window = window
+        self.max_wait = max_wait
+        # Items of the list that have not asked for their vectors yet (None: unknown)
+        self.remaining = items
+        self.vectors = {}
+        self._pending = {}
+        self._batch = {}
+        self._flush_handle = None
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _delay(self):
+        if self.remaining is None:
+            return self.window
+        return 0 if self.remaining <= 0 else self.max_wait
+
+    def _arrive(self):
+        if self.remaining is None:
+            return
+        self.remaining -= 1
+        if self.remaining <= 0 and self._batch:
+            # The last item is in: send the held batch now instead of at max_wait
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._flush_handle = asyncio.get_running_loop().call_soon(self._flush)
+
+    async def embed_item(self, texts):
+        """Return the matrix for every text one item needs; the item asks for no other texts afterwards."""
+        self._arrive()
+        return await self.embed(texts)
+
+    def skip_item(self):
+        """Record that an item will not ask for vectors (e.g. its context expansion failed)."""
+        self._arrive()
+
+    async def embed(self, texts):
+        """Return the (len(texts), D) matrix for these texts, joining the next batched call if needed."""
+        keys = [normalize_text(text) for text in texts]
+        originals = {}
+        for key, text in zip(keys, texts):
+            originals.setdefault(key, text)
+
+        waiting = []
+        for key, text in originals.items():
+            if key in self.vectors:
+                continue
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = asyncio.get_running_loop().create_future()
+                # The normalized key only dedupes: the original text is what gets embedded
+                self._batch[key] = (text, future)
+                if self._flush_handle is None:
+                    self._flush_handle = asyncio.get_running_loop().call_later(self._delay(), self._flush)
+            waiting.append(future)
+
+        if waiting:
+            # shield: one caller being cancelled must not cancel the batch for the others
+            await asyncio.gather(*(asyncio.shield(future) for future in waiting))
+        return np.stack([self.vectors[key] for key in keys])
+
+    def _flush(self):
+        batch, self._batch, self._flush_handle = self._batch, {}, None
+        asyncio.ensure_future(self._embed_batch(batch))
+
+    async def _embed_batch(self, batch):
+        keys = list(batch)
+        try:
+            matrix = await self.provider.embed([batch[key][0] for key in keys])
+        except Exception as e:
+            for key in keys:
+                self._pending.pop(key, None)
+                future = batch[key][1]
+                future.set_exception(e)
+                # Mark the exception as retrieved when every waiter has gone away
+                future.exception()
+            return
+
+        for key, vector in zip(keys, matrix):
+            self.vectors[key] = vector
+            self._pending.pop(key, None)
+            batch[key][1].set_result(vector)
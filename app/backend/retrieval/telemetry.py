@@ -0,0 +1,26 @@
+"""
+Scrape-time gauges for the retrieval caches and pools.
+
+Importing this module registers the collector on the metrics registry served at
+GET /metrics; the components are looked up on every scrape, so the gauges follow
+whatever instances the process is using.
+"""
+from retrieval.context_store import get_context_store
+from retrieval.filter_cache import get_filter_cache
+from retrieval.filter_gate import get_filter_gate
+from utils.compute_pool import get_compute_pool
+from utils.embedding_cache import get_embedding_cache
+from utils.embedding_provider import get_embedding_provider
+from utils.metrics import REGISTRY, stats_gauges
+
+
+@REGISTRY.collector
+def retrieval_gauges():
+    return stats_gauges("retrieval", "Retrieval cache and pool counters", {
+        "embedding_cache": get_embedding_cache().stats,
+        "embedding_provider": get_embedding_provider().stats,
+        "context_store": get_context_store().stats,
+        "filter_cache": get_filter_cache().stats,
+        "filter_gate": get_filter_gate().stats,
+        "compute_pool": get_compute_pool().stats,
+    })
@@ -12,12 +12,10 @@ from pydantic_ai import Agent, RunContext
 load_dotenv()
 
 from agents.common_models import GroceryList, GroceryItem, IntentResult
-from retrieval.hybrid_retrieval import (
-    hybrid_product_retrieval,
-    load_processed_data,
-    display_final_results,
-)
+from retrieval.catalog_store import get_catalog_store
+from retrieval.hybrid_retrieval import hybrid_product_retrieval
 from utils.format_result import format_results_as_json
+from utils.presenter import display_final_results
 
 
 console = Console()
@@ -55,12 +53,14 @@ async def search_products(ctx: RunContext, grocery_list_json: str) -> Dict[str,
         data = json.loads(grocery_list_json)
         grocery_list = GroceryList.model_validate(data)
         
-        # Load data and perform search
-        df_with_embeddings, category_embeddings = load_processed_data()
-        if df_with_embeddings is None or category_embeddings is None:
+        # Perform the search on the catalog loaded at startup
+        catalog = get_catalog_store().current()
+        if catalog is None:
             return {"error": "Falha ao carregar dados de produtos"}
         
-        results = await hybrid_product_retrieval(grocery_list, df_with_embeddings, category_embeddings)
+        results = await hybrid_product_retrieval(
+            grocery_list, catalog.df, catalog.category_embeddings, indexes=catalog.indexes
+        )
         json_results, not_found = format_results_as_json(results)
 
         answer = json_results
@@ -104,8 +104,7 @@ async def main():
     
     # Load product data
     console.print("[bold blue]Inicializando o sistema de busca...[/]")
-    df_with_embeddings, category_embeddings = load_processed_data()
-    if df_with_embeddings is None or category_embeddings is None:
+    if get_catalog_store().current() is None:
         console.print("[red]Erro ao carregar os dados pré-processados.[/]")
         return
     
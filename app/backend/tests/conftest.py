@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Importing the retrieval package builds the agents, which need an OpenAI key (never used here)
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
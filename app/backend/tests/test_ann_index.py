@@ -0,0 +1,56 @@
+import numpy as np
+
+from retrieval.ann_index import IVFIndex, recall_at_k
+from retrieval.product_index import ProductIndex
+
+
+def clustered_catalog(rows=600, dim=16, clusters=12, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    matrix = centers[rng.integers(clusters, size=rows)] + 0.1 * rng.normal(size=(rows, dim))
+    return ProductIndex(matrix, range(rows)), rng.normal(size=(20, dim))
+
+def test_every_row_is_in_exactly_one_list():
+    products, _ = clustered_catalog()
+    index = IVFIndex.build(products.matrix, n_lists=10)
+
+    assert len(index) == len(products)
+    assert sorted(index.list_rows.tolist()) == list(range(len(products)))
+    assert index.list_offsets[-1] == len(products)
+
+def test_probing_every_list_is_exact():
+    products, queries = clustered_catalog()
+    index = IVFIndex.build(products.matrix, n_lists=10)
+
+    result = recall_at_k(index, products, queries, k=10, nprobe=index.n_lists)
+
+    assert result["recall"] == 1.0
+    assert result["scanned"] == 1.0
+
+def test_recall_on_clustered_vectors():
+    products, _ = clustered_catalog()
+    index = IVFIndex.build(products.matrix, n_lists=12, nprobe=3)
+    # Queries near the catalog rows, like real product searches
+    queries = products.matrix[::30] + 0.05
+
+    result = recall_at_k(index, products, queries, k=5)
+
+    assert result["nprobe"] == 3
+    assert result["recall"] >= 0.9
+    assert result["scanned"] < 0.5
+
+def test_save_and_load_keep_the_catalog_version(tmp_path):
+    products, queries = clustered_catalog(rows=100)
+    index = IVFIndex.build(products.matrix, n_lists=5, nprobe=2)
+    path = str(tmp_path / "ann_index.npz")
+
+    index.save(path, catalog_version="abc123")
+    loaded = IVFIndex.load(path)
+
+    assert loaded.catalog_version == "abc123"
+    assert loaded.nprobe == 2
+    np.testing.assert_array_equal(loaded.candidates(queries[0]), index.candidates(queries[0]))
+
+    index.save(path)
+    assert IVFIndex.load(path, nprobe=4).catalog_version is None
+    assert IVFIndex.load(path, nprobe=4).nprobe == 4
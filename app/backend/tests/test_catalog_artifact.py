@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from retrieval.ann_index import IVFIndex
+from retrieval.catalog_artifact import CatalogArtifact, current_version, write_catalog_artifact
+from retrieval.indexes import CatalogIndexes, catalog_fingerprint
+
+
+def catalog(rows=12, dim=4, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "nome_produto": [f"Produto {i} ç" for i in range(rows)],
+        "preco": rng.uniform(1, 50, size=rows),
+        "descricao": [None if i % 5 == 0 else f"desc {i}" for i in range(rows)],
+        "categoria": ["Laticínios|Leites" if i % 2 else "Padaria" for i in range(rows)],
+        "nome_mercado": ["Mercado A|Mercado B" if i % 3 else "Mercado A" for i in range(rows)],
+        "embedding": list(rng.normal(size=(rows, dim))),
+    }, index=pd.Index(range(100, 100 + rows), name="id"))
+    categories = {"Padaria": rng.normal(size=dim), "Laticínios": rng.normal(size=dim)}
+    return df, categories
+
+def test_round_trip(tmp_path):
+    df, categories = catalog()
+    directory = str(tmp_path / "catalog")
+
+    write_catalog_artifact(df, categories, directory)
+    artifact = CatalogArtifact.open(directory, verify=True)
+
+    assert artifact.version == catalog_fingerprint(df) == current_version(directory)
+    assert len(artifact) == len(df)
+
+    loaded = artifact.dataframe()
+    pd.testing.assert_frame_equal(loaded, df.drop(columns="embedding"), check_dtype=False)
+    assert loaded["descricao"].isna().tolist() == df["descricao"].isna().tolist()
+
+    expected = np.stack(df["embedding"].to_list())
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    assert isinstance(artifact.embeddings, np.memmap)
+    np.testing.assert_allclose(artifact.embeddings, expected, rtol=1e-6)
+    assert list(artifact.product_index(loaded).row_ids) == list(df.index)
+
+    loaded_categories = artifact.category_embeddings()
+    assert list(loaded_categories) == list(categories)
+    for name, vector in categories.items():
+        np.testing.assert_allclose(loaded_categories[name], vector, rtol=1e-6)
+
+    assert artifact.ann_index() is None
+
+def test_ann_index_is_published_with_its_version(tmp_path):
+    df, categories = catalog()
+    directory = str(tmp_path / "catalog")
+    index = IVFIndex.build(np.stack(df["embedding"].to_list()).astype(np.float32), n_lists=3)
+
+    write_catalog_artifact(df, categories, directory, ann_index=index)
+    artifact = CatalogArtifact.open(directory)
+
+    assert artifact.ann_index(nprobe=2).catalog_version == artifact.version
+
+def test_verify_detects_changed_files(tmp_path):
+    df, categories = catalog()
+    path = write_catalog_artifact(df, categories, str(tmp_path / "catalog"))
+    artifact = CatalogArtifact.open(str(tmp_path / "catalog"))
+
+    # Same size, different content: only the checksum catches it
+    with open(os.path.join(path, "col.nome_produto.utf8"), "r+b") as f:
+        f.write(b"X")
+    artifact.verify(checksums=False)
+    with pytest.raises(ValueError, match="checksum"):
+        artifact.verify()
+
+    with open(os.path.join(path, "embeddings.npy"), "ab") as f:
+        f.write(b"\0")
+    with pytest.raises(ValueError, match="truncated"):
+        CatalogArtifact.open(str(tmp_path / "catalog"))
+
+def test_new_version_replaces_current(tmp_path):
+    directory = str(tmp_path / "catalog")
+    first, categories = catalog(seed=0)
+    second, _ = catalog(seed=1)
+
+    write_catalog_artifact(first, categories, directory)
+    write_catalog_artifact(second, categories, directory)
+
+    assert current_version(directory) == catalog_fingerprint(second)
+    # The previous version stays readable for processes that still have it open
+    assert CatalogArtifact.open(directory, version=catalog_fingerprint(first)) is not None
+
+def test_no_artifact(tmp_path):
+    assert CatalogArtifact.open(str(tmp_path)) is None
+
+def test_indexes_are_built_on_first_use(tmp_path):
+    df, categories = catalog()
+    write_catalog_artifact(df, categories, str(tmp_path / "catalog"))
+    artifact = CatalogArtifact.open(str(tmp_path / "catalog"))
+    loaded = artifact.dataframe()
+
+    indexes = CatalogIndexes(loaded, artifact.category_embeddings(),
+                             product_index=artifact.product_index(loaded), version=artifact.version)
+    assert indexes._built == {}
+
+    assert indexes.market_index is indexes.market_index
+    assert list(indexes._built) == ["market_index"]
+    assert indexes.market_index.rows(["Mercado B"]).tolist() == [i for i in range(len(df)) if i % 3]
@@ -0,0 +1,80 @@
+import io
+import json
+
+import pytest
+
+from utils.catalog_ingest import _JSONReader, ingest_catalog, iter_catalog
+
+MARKETS = [
+    {"nome_mercado": "Mercado A", "cidade": "Recife", "produtos": [
+        {"nome_produto": "Leite Integral", "preco": 4.99, "categoria": "Laticínios"},
+        {"nome_produto": "Pão Francês", "preco": 12.5, "categoria": "Padaria"},
+    ]},
+    {"produtos": [
+        {"nome_produto": "Leite Integral", "preco": 5.49, "categoria": "Laticínios"},
+        {"nome_produto": "Café", "preco": 1e1, "categoria": "Mercearia", "marca": "X"},
+    ], "nome_mercado": "Mercado B"},
+    {"nome_mercado": "Mercado C", "produtos": []},
+]
+
+
+def write(path, markets, indent=None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(markets, f, ensure_ascii=False, indent=indent)
+    return str(path)
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 4096])
+def test_reader_decodes_values_split_across_chunks(chunk_size):
+    reader = _JSONReader(io.StringIO(' [ 12345, "ç\\"x", {"a": [1, 2.5e3]}, true , null ] '), chunk_size)
+
+    values = [reader.value() for _ in reader.array()]
+
+    assert values == [12345, 'ç"x', {"a": [1, 2500.0]}, True, None]
+    assert reader.peek() == ""
+
+def test_reader_empty_array_and_errors():
+    assert [reader for reader in _JSONReader(io.StringIO("[ ]")).array()] == []
+
+    reader = _JSONReader(io.StringIO("[1 2]"), 1)
+    with pytest.raises(ValueError, match="expected ','"):
+        for _ in reader.array():
+            reader.value()
+
+    with pytest.raises(ValueError, match="expected '\\['"):
+        next(_JSONReader(io.StringIO("{}")).array())
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_catalog_streams_products_then_market(tmp_path, indent):
+    events = list(iter_catalog(write(tmp_path / "catalog.json", MARKETS, indent)))
+
+    assert [(kind, position) for kind, position, _ in events] == [
+        ("product", 0), ("product", 0), ("market", 0),
+        ("product", 1), ("product", 1), ("market", 1),
+        ("market", 2),
+    ]
+    assert events[2][2] == {"nome_mercado": "Mercado A", "cidade": "Recife"}
+    assert events[4][2]["nome_produto"] == "Café"
+
+def test_ingest_merges_markets_of_repeated_products(tmp_path):
+    catalog = ingest_catalog(write(tmp_path / "catalog.json", MARKETS))
+    df = catalog.dataframe()
+
+    assert df["nome_produto"].tolist() == ["Leite Integral", "Pão Francês", "Café"]
+    assert df["nome_mercado"].tolist() == ["Mercado A|Mercado B", "Mercado A", "Mercado B"]
+    # The first occurrence wins, and columns first seen later are filled with None
+    assert df["preco"].tolist() == [4.99, 12.5, 10.0]
+    assert df["marca"].tolist() == [None, None, "X"]
+
+def test_shards_give_the_same_result_as_one_file(tmp_path):
+    whole = ingest_catalog(write(tmp_path / "catalog.json", MARKETS)).dataframe()
+
+    shards = tmp_path / "shards"
+    shards.mkdir()
+    for i, market in enumerate(MARKETS):
+        write(shards / f"{i:02d}.json", [market])
+
+    assert ingest_catalog(str(shards), workers=1).dataframe().equals(whole)
+
+def test_missing_catalog(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ingest_catalog(str(tmp_path))
@@ -0,0 +1,72 @@
+from agents.common_models import GroceryItem, GroceryList, ProductMatch, ProductMatches, RetrievalResults
+from utils.format_result import (
+    GENERIC_MARKET,
+    ResultFormatter,
+    format_results_as_json,
+    format_results_for_frontend,
+)
+
+
+def match(product_id, name, markets, similarity=0.9):
+    return ProductMatch(product_id=product_id, name=name, price=1.0, description="desc",
+                        category="Cat", similarity=similarity, nome_mercado=markets)
+
+def results():
+    items = [GroceryItem(name="leite"), GroceryItem(name="pão"), GroceryItem(name="xyzzy")]
+    return RetrievalResults(
+        corrected_list=GroceryList(items=items),
+        product_matches={
+            "leite": ProductMatches(query_item="leite", matched_categories=[], matches=[
+                match("1", "Leite Integral", "A|B"),
+                match("1", "Leite Integral", "A|B"),
+                match("2", "Leite Desnatado", "B"),
+            ]),
+            "pão": ProductMatches(query_item="pão", matched_categories=[], matches=[
+                match("3", "Pão Francês", ""),
+            ]),
+        },
+    )
+
+def test_by_item_skips_repeated_products_and_lists_not_found():
+    by_item, not_found = format_results_as_json(results())
+
+    assert list(by_item) == ["leite", "pão", "xyzzy"]
+    assert [p["nome_produto"] for p in by_item["leite"]] == ["Leite Integral", "Leite Desnatado"]
+    assert by_item["xyzzy"] == []
+    assert not_found == ["xyzzy"]
+
+def test_by_market_lists_every_item_in_every_market():
+    by_market, _ = format_results_as_json(results(), group_by_market=True)
+
+    assert list(by_market) == ["A", "B", GENERIC_MARKET]
+    assert [p["nome_produto"] for p in by_market["B"]["leite"]] == ["Leite Integral", "Leite Desnatado"]
+    assert by_market["A"]["pão"] == []
+    assert [p["nome_produto"] for p in by_market[GENERIC_MARKET]["pão"]] == ["Pão Francês"]
+
+def test_frontend_views_agree():
+    direct = ResultFormatter.from_results(results()).markets()
+    by_item, _ = format_results_as_json(results())
+    by_market, _ = format_results_as_json(results(), group_by_market=True)
+
+    assert format_results_for_frontend(by_item) == direct
+    assert format_results_for_frontend(by_market) == direct
+    assert direct[0]["itens"]["leite"][0]["nome"] == "Leite Integral"
+    assert direct[0]["itens"]["leite"][0]["marca"] == "Não especificada"
+
+def test_markets_restrict_every_view():
+    formatter = ResultFormatter.from_results(results(), markets=["B"])
+
+    assert list(formatter.by_market()) == ["B"]
+    assert [p["nome_produto"] for p in formatter.by_item["leite"]] == ["Leite Integral", "Leite Desnatado"]
+    # Products without any requested market are left out
+    assert formatter.by_item["pão"] == []
+
+    by_item, _ = format_results_as_json(results())
+    assert [market["nome_mercado"] for market in format_results_for_frontend(by_item, markets=["B"])] == ["B"]
+
+def test_no_products_gives_one_generic_market():
+    formatter = ResultFormatter(["leite"])
+    formatter.add_matches("leite", None)
+
+    assert formatter.not_found == ["leite"]
+    assert formatter.markets() == [{"nome_mercado": GENERIC_MARKET, "itens": {"leite": []}}]
@@ -0,0 +1,50 @@
+import numpy as np
+
+from retrieval.keyword_index import KeywordIndex, fold_text, ngrams
+
+NAMES = ["Pão Francês", "Maçã Fuji", "Leite Integral", "Leite Condensado", "PAO DE QUEIJO", "Café"]
+
+
+def test_fold_text_strips_accents_and_case():
+    assert fold_text("Pão Francês") == "pao frances"
+    assert fold_text("MAÇÃ") == "maca"
+
+def test_ngrams():
+    assert ngrams("leite") == {"lei", "eit", "ite"}
+    assert ngrams("pa") == set()
+
+def test_search_ignores_accents_and_case():
+    index = KeywordIndex(NAMES)
+
+    assert index.search(["pao"]).tolist() == [0, 4]
+    assert index.search(["MACA"]).tolist() == [1]
+    assert index.search(["café"]).tolist() == [5]
+
+def test_search_confirms_the_substring_after_intersecting_trigrams():
+    # "bcabc" has every trigram of "abcab" (abc, bca, cab) but does not contain it
+    index = KeywordIndex(["bcabc", "xabcabx"])
+
+    assert index.search(["abcab"]).tolist() == [1]
+    assert index.search(["queijo"]).size == 0
+
+def test_search_unions_keywords_and_restricts_to_rows():
+    index = KeywordIndex(NAMES)
+
+    assert index.search(["leite", "pao"]).tolist() == [0, 2, 3, 4]
+    assert index.search(["leite", "pao"], rows=np.array([2, 4, 5])).tolist() == [2, 4]
+
+def test_short_keywords_scan_the_folded_texts():
+    index = KeywordIndex(NAMES)
+
+    assert index.search(["fe"]).tolist() == [5]
+    assert index.search(["", "  "]).size == 0
+
+def test_matches_a_plain_substring_scan():
+    rng = np.random.default_rng(0)
+    alphabet = list("abcãé ")
+    texts = ["".join(rng.choice(alphabet, size=12)) for _ in range(200)]
+    index = KeywordIndex(texts)
+
+    for keyword in ["abc", "ca ", "ãéa", "bb", "cae"]:
+        expected = [i for i, text in enumerate(texts) if fold_text(keyword) in fold_text(text)]
+        assert index.search([keyword]).tolist() == expected
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from agents.common_models import GroceryItem, GroceryList, RetrievalResults
+from retrieval.hybrid_retrieval import rank_item
+from retrieval.indexes import CatalogIndexes
+from retrieval.market_index import MarketIndex
+from retrieval.product_index import ProductIndex
+from utils.format_result import ResultFormatter
+
+MARKETS = ["A", "B|A", "C", "A|C|B", "B", "A|A"]
+
+
+def test_bitsets_match_the_membership():
+    index = MarketIndex(MARKETS)
+
+    assert index.names == ["A", "B", "C"]
+    for code, name in enumerate(index.names):
+        members = [name in markets.split("|") for markets in MARKETS]
+        np.testing.assert_array_equal(np.unpackbits(index.bitsets[code], count=len(MARKETS)), members)
+
+def test_bitsets_beyond_one_byte():
+    markets = ["A" if i % 3 else "B" for i in range(21)]
+    index = MarketIndex(markets)
+
+    assert index.rows(["B"]).tolist() == list(range(0, 21, 3))
+    assert index.mask(["A", "B"]).all()
+
+def test_rows_and_restrict():
+    index = MarketIndex(MARKETS)
+
+    assert index.rows(["B"]).tolist() == [1, 3, 4]
+    assert index.rows(["B", "C"]).tolist() == [1, 2, 3, 4]
+    assert index.rows(["Z"]).size == 0
+    assert index.rows([]).size == 0
+    assert index.restrict(np.array([0, 2, 3, 5]), ["C"]).tolist() == [2, 3]
+    assert index.restrict(np.array([], dtype=np.int64), ["A"]).size == 0
+
+def test_row_markets_keep_catalog_order_without_repeats():
+    index = MarketIndex(MARKETS)
+
+    assert [index.row_markets(row) for row in range(len(MARKETS))] == [
+        ["A"], ["B", "A"], ["C"], ["A", "C", "B"], ["B"], ["A"],
+    ]
+
+def catalog():
+    df = pd.DataFrame({
+        "nome_produto": ["Leite Integral", "Leite Desnatado", "Leite Condensado", "Pão Francês"],
+        "preco": [4.99, 5.49, 7.9, 12.5],
+        "descricao": ["desc"] * 4,
+        "categoria": ["Leites", "Leites", "Leites", "Padaria"],
+        "nome_mercado": ["Mercado A|Mercado B", "Mercado A", "Mercado B|Mercado C", "Mercado B"],
+    })
+    vectors = np.array([[1.0, 0.1], [1.0, 0.2], [1.0, 0.3], [0.0, 1.0]])
+    indexes = CatalogIndexes(df, {"Leites": [1.0, 0.0], "Padaria": [0.0, 1.0]},
+                             product_index=ProductIndex(vectors, df.index))
+    return df, indexes
+
+def test_market_filter_reports_only_the_requested_markets():
+    df, indexes = catalog()
+    item = GroceryItem(name="leite")
+
+    result = rank_item(item, df, indexes, item, ["Leites"], np.array([1.0, 0.0]), markets=["Mercado B"])
+
+    assert sorted(match.name for match in result.matches) == ["Leite Condensado", "Leite Integral"]
+    assert all(match.markets == ["Mercado B"] for match in result.matches)
+
+    # Formatted for the same markets, no other market appears in any view
+    results = RetrievalResults(corrected_list=GroceryList(items=[item]), product_matches={"leite": result})
+    formatter = ResultFormatter.from_results(results, markets=["Mercado B"])
+    assert list(formatter.by_market()) == ["Mercado B"]
+    assert [market["nome_mercado"] for market in formatter.markets()] == ["Mercado B"]
+
+def test_without_a_market_filter_every_market_is_reported():
+    df, indexes = catalog()
+    item = GroceryItem(name="leite")
+
+    result = rank_item(item, df, indexes, item, ["Leites"], np.array([1.0, 0.0]))
+
+    markets = {match.name: match.markets for match in result.matches}
+    assert markets == {
+        "Leite Integral": ["Mercado A", "Mercado B"],
+        "Leite Desnatado": ["Mercado A"],
+        "Leite Condensado": ["Mercado B", "Mercado C"],
+    }
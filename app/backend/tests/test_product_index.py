@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from retrieval.product_index import ProductIndex, normalize_rows
+
+
+def cosine(a, b):
+    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+
+def test_similarities_are_cosine():
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(20, 8)).astype(np.float32)
+    index = ProductIndex(matrix, range(20))
+    query = rng.normal(size=8)
+
+    expected = [cosine(query, row) for row in matrix]
+    np.testing.assert_allclose(index.similarities(query), expected, rtol=1e-5, atol=1e-6)
+
+def test_similarities_restricted_to_rows_and_batched():
+    rng = np.random.default_rng(1)
+    index = ProductIndex(rng.normal(size=(10, 4)), range(10))
+    queries = rng.normal(size=(3, 4))
+    rows = np.array([7, 2, 5])
+
+    scores = index.similarities(queries, rows)
+
+    assert scores.shape == (3, 3)
+    np.testing.assert_allclose(scores, index.similarities(queries)[:, rows], rtol=1e-6)
+
+def test_zero_rows_stay_zero():
+    normalized = normalize_rows(np.array([[3.0, 4.0], [0.0, 0.0]]))
+    np.testing.assert_allclose(normalized, [[0.6, 0.8], [0.0, 0.0]])
+
+def test_from_dataframe_reads_embedding_objects():
+    class Embedding:
+        def __init__(self, embedding):
+            self.embedding = embedding
+
+    df = pd.DataFrame({"embedding": [Embedding([1.0, 0.0]), [0.0, 2.0]]}, index=["a", "b"])
+    index = ProductIndex.from_dataframe(df)
+
+    assert len(index) == 2 and index.dim == 2
+    assert list(index.row_ids) == ["a", "b"]
+    np.testing.assert_allclose(index.matrix, [[1.0, 0.0], [0.0, 1.0]])
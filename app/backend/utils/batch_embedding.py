@@ -0,0 +1,152 @@
+import asyncio
+import os
+import time
+
+import numpy as np
+from rich.console import Console
+
+from utils.cache import SQLiteStore
+from utils.embedding_cache import EMBEDDING_MODEL
+from utils.embedding_provider import MAX_BATCH_INPUTS, estimate_tokens
+
+console = Console()
+
+# Tokens per request, well under the limit of the embeddings endpoint
+DEFAULT_BATCH_TOKENS = 100_000
+
+
+def token_batches(items, max_tokens=DEFAULT_BATCH_TOKENS, max_inputs=MAX_BATCH_INPUTS):
+    """
+    Split ``key -> text`` items into batches bounded by estimated tokens and by inputs.
+
+    A single text larger than `max_tokens` gets a batch of its own.
+    """
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for key, text in items.items():
+        tokens = estimate_tokens(text)
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) == max_inputs):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(key)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+class EmbeddingCheckpoint:
+    """
+    Vectors of the batches finished so far, in a SQLite file.
+
+    A run that crashes or is interrupted loads them back and only embeds the rest.
+    The file is removed once the run's output has been saved.
+    """
+
+    def __init__(self, path, model=EMBEDDING_MODEL):
+        self.path = path
+        self.model = model
+        self.store = SQLiteStore(path, table='embedding_checkpoint')
+
+    def load(self, keys):
+        """Return a dict ``key -> vector`` for the keys already embedded."""
+        return {
+            key: np.frombuffer(blob, dtype=np.float32)
+            for key, (blob, _) in self.store.get_many(self.model, keys).items()
+        }
+
+    def save(self, vectors):
+        self.store.put_many(self.model, {key: np.asarray(vector, dtype=np.float32).tobytes()
+                                         for key, vector in vectors.items()})
+
+    def remove(self):
+        self.store.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+async def embed_in_batches(items, provider, model=EMBEDDING_MODEL, checkpoint=None,
+                           max_tokens=DEFAULT_BATCH_TOKENS, concurrency=None):
+    """
+    Embed many texts with several token-sized batches in flight at once.
+
+    Each finished batch is written to the checkpoint (if any) before the next one is
+    picked up, so stopping the run at any point loses at most the batches in flight.
+    Rate limits and transient errors are retried by the provider.
+
+    Args:
+        items (dict): ``key -> text`` to embed (e.g. content hash -> text)
+        provider (EmbeddingProvider): Provider sending the requests
+        model (str): Embedding model name
+        checkpoint (EmbeddingCheckpoint): Where finished batches are kept, optional
+        max_tokens (int): Estimated tokens per request
+        concurrency (int): Batches in flight, defaults to the provider's limit
+
+    Returns:
+        tuple: (dict ``key -> vector``, dict of run statistics)
+    """
+    started = time.perf_counter()
+    vectors = checkpoint.load(list(items)) if checkpoint is not None else {}
+    resumed = len(vectors)
+    if resumed:
+        console.print(f"[green]Resuming: {resumed} embeddings restored from {checkpoint.path}[/]")
+
+    pending = {key: text for key, text in items.items() if key not in vectors}
+    batches = token_batches(pending, max_tokens)
+    queue = asyncio.Queue()
+    for batch in batches:
+        queue.put_nowait(batch)
+
+    finished = 0
+    tokens = 0
+    failure = None
+    report_every = max(1, len(batches) // 20)
+
+    async def worker():
+        nonlocal finished, tokens, failure
+        while failure is None and not queue.empty():
+            batch = queue.get_nowait()
+            texts = [pending[key] for key in batch]
+            try:
+                matrix = await provider.create(texts, model)
+            except Exception as e:
+                # Out of retries: stop taking batches, but let the ones in flight finish
+                failure = failure or e
+                return
+            fresh = dict(zip(batch, matrix))
+            if checkpoint is not None:
+                # SQLite writes go to a thread so they don't stall the other batches
+                await asyncio.to_thread(checkpoint.save, fresh)
+            vectors.update(fresh)
+
+            finished += 1
+            tokens += sum(estimate_tokens(text) for text in texts)
+            if finished % report_every == 0 or finished == len(batches):
+                console.print(f"Processed batch {finished}/{len(batches)}")
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(min(concurrency or provider.max_concurrency, len(batches)))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    if failure is not None:
+        console.print(f"[red]Embedding stopped after {finished}/{len(batches)} batches; "
+                      f"rerun to resume from the checkpoint[/]")
+        raise failure
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "texts": len(items),
+        "resumed": resumed,
+        "embedded": len(pending),
+        "batches": len(batches),
+        "seconds": elapsed,
+        "texts_per_second": len(pending) / elapsed if elapsed else 0.0,
+        "tokens_per_second": tokens / elapsed if elapsed else 0.0,
+    }
+    if batches:
+        console.print(f"[green]Embedded {len(pending)} texts in {len(batches)} batches, "
+                      f"{stats['texts_per_second']:.0f} texts/s, ~{stats['tokens_per_second']:.0f} tokens/s[/]")
+    return vectors, stats
@@ -0,0 +1,137 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache.
+
+    The cache can be bounded by number of entries, by total size, or both; the size
+    of each value is measured with `sizeof` (e.g. ``lambda v: v.nbytes`` for arrays).
+    """
+
+    def __init__(self, max_items=None, max_bytes=None, sizeof=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= self.sizeof(self._data.pop(key))
+            self._data[key] = value
+            self.nbytes += size
+
+            while self._data and (
+                (self.max_items is not None and len(self._data) > self.max_items)
+                or (self.max_bytes is not None and self.nbytes > self.max_bytes)
+            ):
+                _, evicted = self._data.popitem(last=False)
+                self.nbytes -= self.sizeof(evicted)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data.pop(key)
+            self.nbytes -= self.sizeof(value)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+class SQLiteStore:
+    """
+    Small durable key/value tier backed by a single SQLite table.
+
+    Values are raw bytes grouped by namespace (a model name, a prompt version, ...)
+    and carry the time they were written so callers can apply their own TTL.
+    """
+
+    # SQLite limits the number of bound parameters per statement
+    _CHUNK = 500
+
+    def __init__(self, path, table='cache'):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+
+    def get(self, namespace, key):
+        """Return ``(value, updated_at)`` for a key, or None."""
+        return self.get_many(namespace, [key]).get(key)
+
+    def get_many(self, namespace, keys):
+        """Return a dict mapping each stored key to ``(value, updated_at)``."""
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            for i in range(0, len(keys), self._CHUNK):
+                chunk = keys[i:i + self._CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value, updated_at FROM {self.table} "
+                    f"WHERE namespace = ? AND key IN ({placeholders})",
+                    [namespace, *chunk],
+                ).fetchall()
+                for key, value, updated_at in rows:
+                    found[key] = (value, updated_at)
+        return found
+
+    def put(self, namespace, key, value, updated_at=None):
+        self.put_many(namespace, {key: value}, updated_at)
+
+    def put_many(self, namespace, items, updated_at=None):
+        """Insert or replace many ``key -> value`` pairs in one transaction."""
+        updated_at = time.time() if updated_at is None else updated_at
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (namespace, key, value, updated_at) VALUES (?, ?, ?, ?)",
+                [(namespace, key, value, updated_at) for key, value in items.items()],
+            )
+            self._conn.commit()
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE namespace = ? AND key = ?", (namespace, key))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,237 @@
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Bytes read from the catalog file at a time
+READ_CHUNK = 1024 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+class _JSONReader:
+    """Reads JSON values one at a time from a file, keeping only the unread part in memory."""
+
+    def __init__(self, f, chunk_size=READ_CHUNK):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read_more(self):
+        data = self.f.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character ('' at the end of the file)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._read_more():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed catalog: expected {char!r}, found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._read_more():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self._read_more():
+                continue
+            self.pos = end
+            return value
+
+    def array(self):
+        """Iterate over the elements of an array; the caller consumes each element."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            separator = self.peek()
+            self.pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Malformed catalog: expected ',' or ']', found {separator!r}")
+
+def iter_catalog(path):
+    """
+    Stream a catalog.json file (a list of markets, each with `nome_mercado` and `produtos`).
+
+    Yields ``("product", market_position, product)`` for every product as it is read,
+    then ``("market", market_position, fields)`` once the market object is complete
+    (its fields other than `produtos`). Memory is bounded by the largest single product.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _JSONReader(f)
+        for position, _ in enumerate(reader.array()):
+            fields = {}
+            reader.expect("{")
+            if reader.peek() == "}":
+                reader.pos += 1
+            else:
+                while True:
+                    key = reader.value()
+                    reader.expect(":")
+                    if key == 'produtos':
+                        for _ in reader.array():
+                            yield "product", position, reader.value()
+                    else:
+                        fields[key] = reader.value()
+                    separator = reader.peek()
+                    reader.pos += 1
+                    if separator == "}":
+                        break
+                    if separator != ",":
+                        raise ValueError(f"Malformed catalog: expected ',' or '}}', found {separator!r}")
+            yield "market", position, fields
+
+def _market_codes(mask):
+    """Positions of the set bits of a market bitmask, in increasing order."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class CatalogAccumulator:
+    """
+    Unique products of a catalog, kept as columns, with their market membership.
+
+    A product is identified by `nome_produto`; the fields of its first occurrence are
+    kept. Each product's markets are a bitmask over market codes, so adding a market
+    is a single OR instead of a string concatenation.
+    """
+
+    def __init__(self):
+        self.markets = []
+        self.columns = {}
+        self.membership = []
+        self._rows = {}
+
+    def __len__(self):
+        return len(self.membership)
+
+    def _ensure_market(self, code):
+        while len(self.markets) <= code:
+            self.markets.append(None)
+
+    def set_market(self, code, name):
+        self._ensure_market(code)
+        self.markets[code] = name
+
+    def add(self, market_code, product, mask=None):
+        """Add one occurrence of a product in a market (or in the markets of `mask`)."""
+        mask = (1 << market_code) if mask is None else mask
+        name = product['nome_produto']
+        row = self._rows.get(name)
+        if row is not None:
+            self.membership[row] |= mask
+            return
+
+        row = self._rows[name] = len(self.membership)
+        self.membership.append(mask)
+        for column, value in product.items():
+            if column == 'nome_mercado':
+                continue
+            values = self.columns.get(column)
+            if values is None:
+                # Columns first seen now are missing for the earlier rows
+                values = self.columns[column] = [None] * row
+            values.append(value)
+        for values in self.columns.values():
+            if len(values) == row:
+                values.append(None)
+
+    def merge(self, other):
+        """Append another shard's products (after this one's), remapping its market codes by name."""
+        codes = {}
+        for code, name in enumerate(self.markets):
+            codes.setdefault(name, code)
+        remap = {}
+        for code, name in enumerate(other.markets):
+            if name not in codes:
+                codes[name] = len(self.markets)
+                self.markets.append(name)
+            remap[code] = codes[name]
+
+        for row in range(len(other)):
+            mask = 0
+            for code in _market_codes(other.membership[row]):
+                mask |= 1 << remap[code]
+            product = {column: values[row] for column, values in other.columns.items()}
+            self.add(None, product, mask)
+
+    def market_names(self, row):
+        """Markets of a product, in the order they appear in the catalog, without repeats."""
+        return list(dict.fromkeys(self.markets[code] for code in _market_codes(self.membership[row])))
+
+    def dataframe(self):
+        df = pd.DataFrame(self.columns)
+        df['nome_mercado'] = ["|".join(self.market_names(row)) for row in range(len(self))]
+        return df
+
+def ingest_file(path):
+    """Stream one catalog file into a CatalogAccumulator."""
+    catalog = CatalogAccumulator()
+    for kind, position, value in iter_catalog(path):
+        if kind == "product":
+            catalog.add(position, value)
+        else:
+            catalog.set_market(position, value.get('nome_mercado'))
+    return catalog
+
+def catalog_files(catalog_path):
+    """The catalog file itself, or the sorted *.json shards of a catalog directory."""
+    if os.path.isdir(catalog_path):
+        return sorted(glob.glob(os.path.join(catalog_path, '*.json')))
+    return [catalog_path]
+
+def _merge_shards(shards):
+    catalog = None
+    for shard in shards:
+        if catalog is None:
+            catalog = shard
+        else:
+            catalog.merge(shard)
+    return catalog
+
+def ingest_catalog(catalog_path, workers=None):
+    """
+    Ingest a catalog file, or a directory of market shard files in parallel.
+
+    Each shard is parsed in its own process; the shards are then merged in file
+    order, so the result is the same as ingesting their concatenation.
+
+    Returns:
+        CatalogAccumulator: Unique products and their markets
+    """
+    files = catalog_files(catalog_path)
+    if not files:
+        raise FileNotFoundError(f"No catalog files found in {catalog_path}")
+
+    if len(files) == 1 or workers == 1:
+        return _merge_shards(map(ingest_file, files))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return _merge_shards(executor.map(ingest_file, files))
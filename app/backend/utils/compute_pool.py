@@ -0,0 +1,102 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ComputePool:
+    """
+    Bounded thread pool for the CPU-bound stages of a request (ranking, formatting).
+
+    NumPy and pandas release the GIL in their heavy loops, so running these stages in
+    threads keeps the event loop free to serve other requests' I/O. At most
+    `max_workers` tasks run at once and at most `max_queue` more wait for a worker;
+    callers beyond that wait (asynchronously) before submitting.
+    """
+
+    def __init__(self, max_workers=None, max_queue=None):
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.max_queue = self.max_workers * 4 if max_queue is None else max_queue
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="compute")
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self._lock = threading.Lock()
+        # Admission slots are asyncio objects, so there is one per event loop
+        self._slots = weakref.WeakKeyDictionary()
+
+    def _slots_for(self, loop):
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = self._slots[loop] = asyncio.Semaphore(self.max_workers + self.max_queue)
+        return slots
+
+    def _call(self, fn, submitted):
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_seconds += started - submitted
+        try:
+            return fn()
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.busy_seconds += time.perf_counter() - started
+
+    async def run(self, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` in the pool (in a copy of the caller's context) and return its result."""
+        loop = asyncio.get_running_loop()
+        async with self._slots_for(loop):
+            with self._lock:
+                self.queued += 1
+                self.max_queued = max(self.max_queued, self.queued)
+            # Keep context variables (e.g. the current tracing span) in the worker thread
+            task = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+            call = functools.partial(self._call, task, time.perf_counter())
+            return await loop.run_in_executor(self.executor, call)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "running": self.running,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "busy_seconds": self.busy_seconds,
+                "wait_seconds": self.wait_seconds,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_compute_pool():
+    """Return the process-wide compute pool, configured from the environment."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            max_queue = os.getenv("COMPUTE_MAX_QUEUE")
+            _pool = ComputePool(
+                max_workers=int(os.getenv("COMPUTE_WORKERS", 0)) or None,
+                max_queue=int(max_queue) if max_queue else None,
+            )
+        return _pool
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import threading
+
+import numpy as np
+
+from utils.cache import LRUCache, SQLiteStore
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+
+def normalize_text(text):
+    """Normalize a text before embedding it so trivial variations share one cache entry."""
+    return " ".join(str(text).split()).lower()
+
+class EmbeddingCache:
+    """
+    Two-tier cache of embedding vectors keyed by (model, normalized text).
+
+    The first tier is an in-process LRU bounded by memory; the second is a SQLite
+    file that survives restarts. Vectors are stored as float32. Only the memory tier
+    is used on the event loop; SQLite reads and writes run in a worker thread.
+    """
+
+    def __init__(self, path=None, max_bytes=64 * 1024 * 1024):
+        self.memory = LRUCache(max_bytes=max_bytes, sizeof=lambda vector: vector.nbytes)
+        self.disk = SQLiteStore(path, table='embeddings') if path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get_many(self, model, texts):
+        """Return a dict ``text -> vector`` for the (normalized) texts that are cached."""
+        found = {}
+        pending = []
+        for text in texts:
+            vector = self.memory.get((model, text))
+            if vector is not None:
+                found[text] = vector
+            else:
+                pending.append(text)
+        self.memory_hits += len(found)
+
+        if pending and self.disk is not None:
+            stored = await asyncio.to_thread(self.disk.get_many, model, pending)
+            for text, (blob, _) in stored.items():
+                vector = np.frombuffer(blob, dtype=np.float32)
+                self.memory.put((model, text), vector)
+                found[text] = vector
+                self.disk_hits += 1
+
+        self.misses += len(texts) - len(found)
+        return found
+
+    async def put_many(self, model, vectors):
+        """Store a dict ``text -> vector`` in both tiers."""
+        vectors = {text: np.asarray(vector, dtype=np.float32) for text, vector in vectors.items()}
+        for text, vector in vectors.items():
+            self.memory.put((model, text), vector)
+        if self.disk is not None and vectors:
+            await asyncio.to_thread(self.disk.put_many, model, {text: vector.tobytes() for text, vector in vectors.items()})
+
+    def stats(self):
+        """Return hit/miss counters and memory usage of the cache."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+            "bytes": self.memory.nbytes,
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_embedding_cache():
+    """Return the process-wide embedding cache, configured from the environment."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(
+                path=os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite") or None,
+                max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+            )
+        return _cache
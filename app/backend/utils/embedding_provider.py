@@ -0,0 +1,228 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import numpy as np
+from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, InternalServerError, RateLimitError
+
+from utils.embedding_cache import EMBEDDING_MODEL, get_embedding_cache, normalize_text
+from utils.tracing import span
+
+# The embeddings endpoint accepts at most 2048 inputs per request
+MAX_BATCH_INPUTS = 2048
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait (Retry-After header of a 429), if any."""
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for rate limiting and batching."""
+    return len(text) // 4 + 1
+
+class RateLimiter:
+    """Token buckets for the requests and tokens per minute allowed for one model."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, tokens=1):
+        """Wait until one request carrying `tokens` tokens fits in both buckets."""
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)
+
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._requests < 1:
+                    wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+                if self.tokens_per_minute and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            if self.requests_per_minute:
+                self._requests -= 1
+            if self.tokens_per_minute:
+                self._tokens -= tokens
+
+class _LoopState:
+    """Client, concurrency limit and rate limiters bound to one event loop."""
+
+    def __init__(self, provider):
+        self.client = AsyncOpenAI(
+            max_retries=0,
+            timeout=provider.timeout,
+            base_url=provider.base_url,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=provider.max_concurrency,
+                    max_keepalive_connections=provider.max_concurrency,
+                ),
+                timeout=provider.timeout,
+            ),
+        )
+        self.semaphore = asyncio.Semaphore(provider.max_concurrency)
+        self.limiters = {}
+
+class EmbeddingProvider:
+    """
+    Process-wide, non-blocking access to the OpenAI embeddings API.
+
+    All calls share one pooled AsyncOpenAI/httpx client per event loop, are capped at
+    `max_concurrency` requests in flight, respect a per-model requests/tokens per
+    minute budget and are retried with jittered exponential backoff. Query texts go
+    through the embedding cache first.
+    """
+
+    def __init__(self, max_concurrency=8, requests_per_minute=None, tokens_per_minute=None,
+                 max_retries=5, base_delay=0.5, max_delay=30.0, timeout=60.0, base_url=None, cache=None):
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.base_url = base_url
+        self.cache = cache
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self._states = weakref.WeakKeyDictionary()
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _LoopState(self)
+        return state
+
+    def _limiter(self, state, model):
+        limiter = state.limiters.get(model)
+        if limiter is None:
+            limiter = state.limiters[model] = RateLimiter(self.requests_per_minute, self.tokens_per_minute)
+        return limiter
+
+    async def create(self, texts, model=EMBEDDING_MODEL):
+        """Embed one batch of texts with a single API request (no cache), retrying transient errors."""
+        state = self._state()
+        limiter = self._limiter(state, model)
+        tokens = sum(estimate_tokens(text) for text in texts)
+
+        with span("embedding", inputs=len(texts), tokens=tokens, model=model) as stage:
+            for attempt in range(self.max_retries + 1):
+                await limiter.acquire(tokens)
+                try:
+                    async with state.semaphore:
+                        self.requests += 1
+                        response = await state.client.embeddings.create(input=texts, model=model)
+                    stage.set(attempts=attempt + 1)
+                    return np.array([emb.embedding for emb in response.data], dtype=np.float32)
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        self.failures += 1
+                        raise
+                    self.retries += 1
+                    # Full jitter: spread retries of concurrent callers over the whole backoff window
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                    # ...but never retry before the server said we may
+                    delay = max(delay, min(self.max_delay, retry_after(e) or 0.0))
+                    await asyncio.sleep(delay)
+
+    async def embed(self, texts, model=EMBEDDING_MODEL, use_cache=True, batch_size=MAX_BATCH_INPUTS):
+        """
+        Embed texts, concurrently across batches and through the cache by default.
+
+        Args:
+            texts (list): Texts to embed (duplicates are embedded once)
+            model (str): Embedding model name
+            use_cache (bool): Look up and store query texts in the embedding cache
+            batch_size (int): Maximum number of texts sent in a single request
+
+        Returns:
+            np.ndarray: float32 matrix with one row per input text
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        if not use_cache:
+            batches = [list(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+            return np.concatenate(await asyncio.gather(*(self.create(batch, model) for batch in batches)))
+
+        cache = self.cache or get_embedding_cache()
+        # The normalized text is only the cache (and dedupe) key: the API embeds the
+        # first original text of each key, so casing matches the catalog embeddings
+        keys = [normalize_text(text) for text in texts]
+        originals = {}
+        for key, text in zip(keys, texts):
+            originals.setdefault(key, text)
+
+        vectors = await cache.get_many(model, list(originals))
+        missing = [key for key in originals if key not in vectors]
+        if missing:
+            batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+            results = await asyncio.gather(*(
+                self.create([originals[key] for key in batch], model) for batch in batches
+            ))
+            fresh = {key: vector for batch, matrix in zip(batches, results) for key, vector in zip(batch, matrix)}
+            await cache.put_many(model, fresh)
+            vectors.update(fresh)
+
+        return np.stack([vectors[key] for key in keys])
+
+    def stats(self):
+        return {"requests": self.requests, "retries": self.retries, "failures": self.failures}
+
+def _optional_int(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_embedding_provider():
+    """Return the process-wide embedding provider, configured from the environment."""
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = EmbeddingProvider(
+                max_concurrency=int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 8)),
+                requests_per_minute=_optional_int("EMBEDDING_REQUESTS_PER_MINUTE"),
+                tokens_per_minute=_optional_int("EMBEDDING_TOKENS_PER_MINUTE"),
+                max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", 5)),
+                base_url=os.getenv("EMBEDDING_BASE_URL") or None,
+            )
+        return _provider
+
+def set_embedding_provider(provider):
+    """Replace the process-wide embedding provider (e.g. with a stub in benchmarks)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider
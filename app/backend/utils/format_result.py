@@ -1,178 +1,163 @@
-from rich.console import Console
+from utils.presenter import get_presenter
+from utils.tracing import span
 
-console = Console()
+# Market of products without market information
+GENERIC_MARKET = "Mercado Genérico"
 
-def format_results_as_json(results, group_by_market=False):
+def product_info(match):
+    """Product dict used in the JSON results for a ProductMatch."""
+    return {
+        "nome_produto": match.name,
+        "preco": match.price,
+        "descricao": match.description,
+        "categoria": match.category,
+        "similaridade": match.similarity,
+        "nome_mercado": match.nome_mercado if hasattr(match, 'nome_mercado') else "",
+    }
+
+def frontend_product(info):
+    """Product entry of the MARKET_DATA structure in marketData.ts, from a product dict."""
+    return {
+        "categoria": info.get("categoria", ""),
+        "descricao": info.get("descricao", ""),
+        "marca": info.get("marca", "Não especificada"),
+        "nome": info.get("nome_produto", ""),
+        "similaridade": info.get("similaridade", 0),
+        "valor": info.get("preco", "R$ 0.00")
+    }
+
+class ResultFormatter:
+    """
+    Builds every view of the retrieval results in a single pass over the matches.
+
+    Each product is formatted once and appended to its item (the by-item JSON) and to
+    each of its markets, both as a product dict (the by-market JSON) and as a frontend
+    entry. Repeated products of an item are skipped by product_id, so formatting is
+    linear in the number of matches. With `markets`, the by-market views only list
+    those markets.
+    """
+
+    def __init__(self, item_names=(), markets=None):
+        self.by_item = {name: [] for name in item_names}
+        self.allowed_markets = set(markets) if markets else None
+        self.not_found = []
+        self._by_market = {}
+        self._frontend = {}
+        self._seen = set()
+
+    @classmethod
+    def from_results(cls, results, markets=None):
+        """Format a RetrievalResults, keeping the shopping list order (and only `markets`, if given)."""
+        with span("formatting", items=len(results.corrected_list.items)) as stage:
+            formatter = cls((item.name for item in results.corrected_list.items), markets)
+            for item in results.corrected_list.items:
+                formatter.add_matches(item.name, results.product_matches.get(item.name))
+            stage.set(products=len(formatter._seen), markets=len(formatter._frontend))
+        return formatter
+
+    def add_matches(self, item_name, item_results):
+        """Add the matches (ProductMatches) of one item; an item without matches is not found."""
+        products = self.by_item.setdefault(item_name, [])
+        if not item_results or not item_results.matches:
+            self.not_found.append(item_name)
+            return products
+
+        for match in item_results.matches:
+            key = (item_name, match.product_id)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            self._add(item_name, product_info(match), match.markets)
+        return products
+
+    def add_products(self, item_name, products):
+        """Add already formatted product dicts of one item, reading their markets from nome_mercado."""
+        self.by_item.setdefault(item_name, [])
+        for info in products:
+            markets = info["nome_mercado"].split("|") if info.get("nome_mercado") else []
+            self._add(item_name, info, markets)
+
+    def _add(self, item_name, info, markets):
+        if self.allowed_markets is not None:
+            markets = [market for market in markets if market in self.allowed_markets]
+            if not markets:
+                # Not sold in any of the requested markets
+                return
+        self.by_item[item_name].append(info)
+        entry = frontend_product(info)
+        for market in markets or [GENERIC_MARKET]:
+            by_market = self._by_market.get(market)
+            if by_market is None:
+                by_market = self._by_market[market] = {}
+                self._frontend[market] = {}
+            by_market.setdefault(item_name, []).append(info)
+            self._frontend[market].setdefault(item_name, []).append(entry)
+
+    def by_market(self):
+        """Product dicts grouped by market, then by item (every item listed in every market)."""
+        return {
+            market: {item_name: items.get(item_name, []) for item_name in self.by_item}
+            for market, items in self._by_market.items()
+        }
+
+    def markets(self):
+        """List of market objects in the format expected by the frontend (MARKET_DATA)."""
+        if not self._frontend and self.by_item:
+            # No products at all: a single market listing the (empty) items
+            return [{"nome_mercado": GENERIC_MARKET, "itens": {item_name: [] for item_name in self.by_item}}]
+        return [
+            {
+                "nome_mercado": market,
+                "itens": {item_name: items.get(item_name, []) for item_name in self.by_item}
+            }
+            for market, items in self._frontend.items()
+        ]
+
+def format_results_as_json(results, group_by_market=False, markets=None):
     """Format the retrieval results as a JSON with items as top-level keys.
-    
+
     Args:
         results: The retrieval results containing product matches
         group_by_market: If True, results will be organized by market instead of by item
+        markets: Only list these markets (the markets the search was restricted to)
     """
-    out_name=[]
-    if not group_by_market:
-        formatted_results = {}
-        
-        # Process each item in the shopping list
-        for item in results.corrected_list.items:
-            formatted_results[item.name] = []
-            item_results = results.product_matches.get(item.name)
-            
-            if not item_results or not item_results.matches:
-                out_name.append(item_results.query_item)
-                continue
-            
-            # Process each product match
-
-            for match in item_results.matches:
-                
-                # Create product info
-                product_info = {
-                    "nome_produto": match.name,
-                    "preco": match.price,
-                    "descricao": match.description,
-                    "categoria": match.category,
-                    "similaridade": match.similarity,
-                    "nome_mercado": match.nome_mercado if hasattr(match, 'nome_mercado') else "",
-                }
-                
-                # Check if this exact product is already in the list
-                if product_info not in formatted_results[item.name]:
-                    formatted_results[item.name].append(product_info)
-        
-        console.print(f"[green] maaaaaa olha -> {out_name}")
-        return formatted_results, out_name
-    else:
-        # Group by market
-        market_results = {}
-        
-        # First, collect all unique markets
-        all_markets = set()
-        for item_name, item_results in results.product_matches.items():
-            if item_results and item_results.matches:
-                for match in item_results.matches:
-                    markets = match.nome_mercado.split('|') if hasattr(match, 'nome_mercado') else ["Mercado Genérico"]
-                    all_markets.update(markets)
-        
-        # Initialize results for each market
-        for market in all_markets:
-            market_results[market] = {}
-            # Initialize empty lists for all items in this market
-            for item in results.corrected_list.items:
-                market_results[market][item.name] = []
-        
-        # Process each item and its matches
-        for item in results.corrected_list.items:
-            item_results = results.product_matches.get(item.name)
-            
-            if not item_results or not item_results.matches:
-                out_name.append(item_results.query_item)
-                continue
-            
-            # Process each product match
-            for match in item_results.matches:
-                
-    
-                # Create product info
-                product_info = {
-                    "nome_produto": match.name,
-                    "preco": match.price,
-                    "descricao": match.description,
-                    "categoria": match.category,
-                    "similaridade": match.similarity,
-                    "nome_mercado": match.nome_mercado if hasattr(match, 'nome_mercado') else "",
-                }
-                
-                # Add product to each market it belongs to
-                markets = match.nome_mercado.split('|') if hasattr(match, 'nome_mercado') else ["Mercado Genérico"]
-                for market in markets:
-                    if product_info not in market_results[market][item.name]:
-                        market_results[market][item.name].append(product_info)
-        console.print(f"[gree] maaaaaaa olhaaa ->> {out_name}") 
-        return market_results, out_name 
-
-def format_results_for_frontend(results_json):
+    formatter = ResultFormatter.from_results(results, markets)
+    get_presenter().not_found(formatter.not_found)
+    if group_by_market:
+        return formatter.by_market(), formatter.not_found
+    return formatter.by_item, formatter.not_found
+
+def format_results_for_frontend(results_json, markets=None):
     """
     Formats the search results to match the MARKET_DATA structure in marketData.ts.
-    
+
+    Results available as RetrievalResults are better formatted with
+    ResultFormatter.from_results(results).markets(), which skips the JSON step.
+
     Args:
-        results_json: JSON results from hybrid_product_retrieval
-        
+        results_json: JSON results from format_results_as_json (by item or by market)
+        markets: Only list these markets (the markets the search was restricted to)
+
     Returns:
         List of market objects in the format expected by frontend
     """
     # If the results are already grouped by market
     if isinstance(results_json, dict) and any(isinstance(v, dict) for v in results_json.values()):
-        markets_list = []
-        
-        # Transform each market entry to match the frontend format
-        for market_name, items in results_json.items():
-            market_data = {
+        return [
+            {
                 "nome_mercado": market_name,
-                "itens": {}
+                "itens": {
+                    item_name: [frontend_product(p) for p in products]
+                    for item_name, products in items.items()
+                }
             }
-            
-            # Transform the items structure
-            for item_name, products in items.items():
-                market_data["itens"][item_name] = [
-                    {
-                        "categoria": p.get("categoria", ""),
-                        "descricao": p.get("descricao", ""),
-                        "marca": p.get("marca", "Não especificada"),
-                        "nome": p.get("nome_produto", ""),
-                        "similaridade": p.get("similaridade", 0),
-                        "valor": p.get("preco", "R$ 0.00")
-                    }
-                    for p in products
-                ]
-            
-            markets_list.append(market_data)
-        
-        return markets_list
-    
-    # If the results are grouped by item, restructure them
-    else:
-        # First, collect all unique markets across all products
-        all_markets = set()
+            for market_name, items in results_json.items()
+            if not markets or market_name in markets
+        ]
+
+    # If the results are grouped by item, split each product's markets once
+    with span("formatting", items=len(results_json)):
+        formatter = ResultFormatter(results_json.keys(), markets)
         for item_name, products in results_json.items():
-            for product in products:
-                if "nome_mercado" in product:
-                    markets = product.get("nome_mercado", "").split("|")
-                    all_markets.update(markets)
-                
-        # If no market information is found, create a generic market
-        if not all_markets:
-            all_markets = {"Mercado Genérico"}
-        
-        # Create the structure for each market
-        markets_list = []
-        for market_name in all_markets:
-            market_data = {
-                "nome_mercado": market_name,
-                "itens": {}
-            }
-            
-            # Initialize empty lists for all items
-            for item_name in results_json.keys():
-                market_data["itens"][item_name] = []
-            
-            # Add products to their respective markets
-            for item_name, products in results_json.items():
-                for product in products:
-                    # Check if this product belongs to this market
-                    product_markets = product.get("nome_mercado", "").split("|") if "nome_mercado" in product else []
-                    
-                    if market_name in product_markets:
-                        product_data = {
-                            "categoria": product.get("categoria", ""),
-                            "descricao": product.get("descricao", ""),
-                            "marca": product.get("marca", "Não especificada"),
-                            "nome": product.get("nome_produto", ""),
-                            "similaridade": product.get("similaridade", 0),
-                            "valor": product.get("preco", "R$ 0.00")
-                        }
-                        market_data["itens"][item_name].append(product_data)
-            
-            markets_list.append(market_data)
-        
-        return markets_list 
+            formatter.add_products(item_name, products)
+        return formatter.markets()
@@ -0,0 +1,223 @@
+import json
+
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+
+console = Console()
+
+
+class Presenter:
+    """
+    Receives what the retrieval pipeline is doing, to show it to a user.
+
+    This base presenter is headless: every hook does nothing, so retrieval only
+    returns data and no rendering work is done. It is the default, used by the API
+    servers; the command-line tools install a CliPresenter instead.
+    """
+
+    def shopping_list(self, items):
+        """Item names of the list about to be searched."""
+
+    def item_context(self, item_name, item_context):
+        """Expanded context (synonyms, categories, description) of an item."""
+
+    def candidate_rows(self, item_name, count, matched_categories, markets):
+        """Products left for an item after the category and market filters."""
+
+    def keyword_rows(self, item_name, count):
+        """Products of an item matching its keywords."""
+
+    def approximate_search(self, item_name, count):
+        """Candidates of an item returned by the ANN index."""
+
+    def threshold(self, item_name, threshold):
+        """Adaptive similarity threshold chosen for an item."""
+
+    def item_results(self, item_results):
+        """Ranked matches (ProductMatches) of an item, before the LLM filter."""
+
+    def filter_payload(self, item_name, payload):
+        """Data sent to the product filter agent for an item."""
+
+    def filter_outcome(self, item_name, outcome, **details):
+        """How the LLM filter of an item ended (cached, skipped, empty, no_response or error)."""
+
+    def retrieval_done(self, results):
+        """Final RetrievalResults of a list."""
+
+    def not_found(self, item_names):
+        """Items left without any product."""
+
+    def final_results(self, results):
+        """Summary of a RetrievalResults, with every product found."""
+
+    def final_response(self, response):
+        """Final structured response of a shopping list."""
+
+class CliPresenter(Presenter):
+    """Renders the pipeline progress and results on the terminal with rich."""
+
+    def __init__(self, console=console):
+        self.console = console
+
+    def shopping_list(self, items):
+        self.console.print(Panel(
+            "\n".join([f"• {item}" for item in items]),
+            title="Shopping List",
+            expand=False
+        ))
+
+    def item_context(self, item_name, item_context):
+        self.console.print(f"[bold yellow]Processing item:[/] [bold]{item_name}[/]")
+        self.console.print(Panel(
+            f"[bold]Expanded Context:[/]\n"
+            f"[cyan]Synonyms:[/] {', '.join(item_context.possible_synonyms or [])}\n"
+            f"[cyan]Categories:[/] {', '.join(item_context.possible_categories or [])}\n"
+            f"[cyan]Description:[/] {item_context.description}",
+            title=f"Context for {item_name}",
+            expand=False
+        ))
+
+    def candidate_rows(self, item_name, count, matched_categories, markets):
+        if matched_categories:
+            self.console.print(f"[green]Found {count} products in {len(matched_categories)} matching categories[/]")
+        elif markets:
+            self.console.print(f"[yellow]No matching categories found, using all {count} products of the selected markets[/]")
+        else:
+            self.console.print("[yellow]No matching categories found, using all products[/]")
+
+    def keyword_rows(self, item_name, count):
+        if count > 0:
+            self.console.print(f"[green]Found {count} products matching keywords[/]")
+        else:
+            self.console.print("[yellow]No keyword matches found[/]")
+
+    def approximate_search(self, item_name, count):
+        self.console.print(f"[yellow]Using approximate search over {count} products[/]")
+
+    def threshold(self, item_name, threshold):
+        self.console.print(f"[cyan]Adaptive threshold:[/] {threshold:.4f}")
+
+    def item_results(self, item_results):
+        if not item_results.matches:
+            self.console.print("[bold red]No matches found![/]")
+            return
+
+        # Create a table for results
+        table = Table(title=f"Results for {item_results.query_item}")
+        table.add_column("No.", style="dim")
+        table.add_column("Product Name", style="cyan")
+        table.add_column("Price", style="green")
+        table.add_column("Category", style="yellow")
+        table.add_column("Similarity", style="magenta")
+
+        # Add rows to the table
+        for i, match in enumerate(item_results.matches):
+            # Extract primary category (first one from the categories string)
+            primary_category = match.category.split('|')[0] if '|' in match.category else match.category
+
+            table.add_row(
+                str(i+1),
+                match.name,
+                f"R${match.price:.2f}",
+                primary_category,
+                f"{match.similarity:.2f}"
+            )
+
+        self.console.print(table)
+        self.console.print(f"[cyan]Matched categories:[/] {', '.join(item_results.matched_categories)}")
+        self.console.print()
+
+    def filter_payload(self, item_name, payload):
+        self.console.print(Panel(
+            json.dumps(payload, indent=2, ensure_ascii=False),
+            title=f"Data being sent to product_filter_agent for {item_name}",
+            expand=False
+        ))
+
+    def filter_outcome(self, item_name, outcome, **details):
+        if outcome == "cached":
+            self.console.print(f"[green]Using cached filter verdict for {item_name}[/]")
+        elif outcome == "skipped":
+            self.console.print(f"[green]Skipping filter for {item_name} (confidence {details['confidence']:.2f})[/]")
+        elif outcome == "empty":
+            self.console.print(f"[green]No relevant products found for {item_name} after filtering[/]")
+        elif outcome == "no_response":
+            self.console.print(f"[red]Error in filtering for {item_name}, using original matches[/]")
+        elif outcome == "error":
+            self.console.print(f"[red]Error filtering {item_name}: {details['error']}[/]")
+            self.console.print("[yellow]Using original matches as fallback[/]")
+
+    def retrieval_done(self, results):
+        self.console.print(f"[green]Filtering complete. Processed {len(results.product_matches)} items.[/]")
+
+    def not_found(self, item_names):
+        self.console.print(f"[green]Itens não encontrados: {item_names}[/]")
+
+    def final_results(self, results):
+        total_items = len(results.corrected_list.items)
+        total_matches = sum(len(matches.matches) for matches in results.product_matches.values())
+
+        self.console.print("\n")
+        self.console.print(Panel(
+            f"[bold]Total items:[/] {total_items}\n"
+            f"[bold]Total product matches:[/] {total_matches}",
+            title="Summary",
+            expand=False
+        ))
+
+        # Display all found products grouped by item
+        self.console.print(Panel("[bold]All Found Products[/]", expand=False))
+
+        for item in results.corrected_list.items:
+            item_results = results.product_matches.get(item.name)
+            if not item_results or not item_results.matches:
+                self.console.print(f"[bold yellow]{item.name}:[/] [red]No matches found[/]")
+                self.console.print()
+                continue
+
+            self.console.print(f"[bold yellow]{item.name}[/] ({len(item_results.matches)} products)")
+
+            # Create a table for item results
+            table = Table(show_header=True, width=100)
+            table.add_column("No.", style="dim", width=4)
+            table.add_column("Product Name", style="cyan")
+            table.add_column("Price", style="green", width=10)
+            table.add_column("Category", style="yellow", width=15)
+            table.add_column("Similarity", style="magenta", width=10)
+
+            for i, match in enumerate(item_results.matches):
+                # Extract primary category
+                primary_category = match.category.split('|')[0] if '|' in match.category else match.category
+
+                table.add_row(
+                    str(i+1),
+                    match.name,
+                    f"R${match.price:.2f}",
+                    primary_category,
+                    f"{match.similarity:.2f}"
+                )
+
+            self.console.print(table)
+            self.console.print(f"[dim]Matched categories: {', '.join(item_results.matched_categories)}[/]")
+            self.console.print("\n" + "-" * 80 + "\n")  # Divider between items
+
+    def final_response(self, response):
+        self.console.print("\n[bold]Resultados Finais:[/]")
+        self.console.print(json.dumps(response, indent=2, ensure_ascii=False))
+
+_presenter = Presenter()
+
+def get_presenter():
+    """Return the process-wide presenter (headless unless a CLI installed its own)."""
+    return _presenter
+
+def set_presenter(presenter):
+    """Replace the process-wide presenter, e.g. with a CliPresenter in command-line tools."""
+    global _presenter
+    _presenter = presenter
+
+def display_final_results(results):
+    """Display a comprehensive summary of all results on the terminal."""
+    CliPresenter().final_results(results)
@@ -0,0 +1,126 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from utils.metrics import REGISTRY, SIZE_BUCKETS
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "retrieval_stage_duration_seconds", "Duration of each retrieval pipeline stage",
+    labelnames=("stage",),
+)
+STAGE_CANDIDATES = REGISTRY.histogram(
+    "retrieval_stage_candidates", "Products a retrieval stage worked on (its `candidates` attribute)",
+    buckets=SIZE_BUCKETS, labelnames=("stage",),
+)
+STAGE_ERRORS = REGISTRY.counter(
+    "retrieval_stage_errors_total", "Retrieval stages that raised an exception",
+    labelnames=("stage",),
+)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed stage of a request, with its attributes and its place in the trace."""
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+        self._started = time.perf_counter()
+
+    def set(self, **attributes):
+        """Add attributes known only once the stage ran (e.g. how many candidates it kept)."""
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": self.duration * 1000 if self.duration is not None else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+class Tracer:
+    """
+    Receives finished spans: updates the stage metrics, keeps the most recent spans
+    in memory and, when `record_path` is set, appends them to a JSONL file.
+    """
+
+    def __init__(self, record_path=None, keep=1000):
+        self.record_path = record_path
+        self.recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        STAGE_SECONDS.observe(span.duration, stage=span.name)
+        candidates = span.attributes.get("candidates")
+        if isinstance(candidates, int):
+            STAGE_CANDIDATES.observe(candidates, stage=span.name)
+        if span.error:
+            STAGE_ERRORS.inc(stage=span.name)
+
+        self.recent.append(span)
+        if self.record_path:
+            line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+            with self._lock:
+                with open(self.record_path, 'a', encoding='utf-8') as f:
+                    f.write(line + "\n")
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def get_tracer():
+    """Return the process-wide tracer, configured from the environment."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(record_path=os.getenv("TRACE_SPANS_PATH") or None)
+        return _tracer
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """
+    Time a pipeline stage as a child of the current span (if any).
+
+    Usable around synchronous and asynchronous code alike. Tasks, and functions run
+    in the compute pool, inherit the span that was current when they were started.
+
+        with span("keyword_prefilter", item=item.name, candidates=len(rows)) as stage:
+            ...
+            stage.set(matches=len(found))
+    """
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+        get_tracer().record(current)
+
+def annotate(**attributes):
+    """Add attributes to the current span, if there is one."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
@@ -23,6 +23,9 @@ interface ApiResponse {
   isMarketData?: boolean;
 }
 
+// Chat session returned by the backend, sent back so the conversation continues
+let sessionId: string | null = null;
+
 // Backend API URL
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
@@ -34,7 +37,7 @@ export async function searchProducts(message: string): Promise<ApiResponse> {
       headers: {
         'Content-Type': 'application/json',
       },
-      body: JSON.stringify({ message }),
+      body: JSON.stringify({ message, session_id: sessionId }),
     });
 
     if (!response.ok) {
@@ -42,6 +45,9 @@ export async function searchProducts(message: string): Promise<ApiResponse> {
     }
 
     const data = await response.json();
+    if (data.session_id) {
+      sessionId = data.session_id;
+    }
     
     // Check if the response is a markets array or a text message
     if (data.message && Array.isArray(data.message) && data.message.length > 0 && data.message[0].nome_mercado) {